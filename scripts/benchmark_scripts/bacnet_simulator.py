@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+BACnet/IP Device Simulator
+
+This script stands up virtual BACnet/IP devices on localhost that expose every point
+configured in a site config, so check_exported_bacnet_points.py and the BACnet agent can
+be exercised and load-tested without a real plant. Each configured BACnet server
+(bacnet_ip) becomes one virtual device (device instance 24) on its own localhost port,
+fronted by a UDP proxy that can inject latency, packet loss and duplicate packets. Each
+virtual device runs in its own process, since BAC0 keeps its BACnet stack in global state.
+
+Duplicated points are exported by a second virtual device next to the original server, and
+--write-config adds that device as an extra server of the affected BACnet devices, so the point
+check sees the point at two addresses.
+
+Object names follow the '<device_id>.<datapoint>' convention expected by the point check,
+and object type/instance are taken from each point's point_address (e.g. 'analogValue 12').
+
+Usage:
+    python bacnet_simulator.py <site_id> [options]
+    python bacnet_simulator.py --synthetic 50x2000 [options]
+
+Example:
+    python bacnet_simulator.py cp9 --latency-ms 20 --loss-rate 0.01 --rename-ratio 0.001 \\
+        --write-config $WORKING_DIR/site_configs/cp9-sim.yaml
+    python $WORKING_DIR/scripts/config_check_scripts/check_exported_bacnet_points.py cp9-sim
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import re
+import signal
+import time
+
+import BAC0
+import yaml
+from BAC0.core.devices.local.models import (
+    analog_input,
+    analog_output,
+    analog_value,
+    binary_input,
+    binary_output,
+    binary_value,
+    multistate_input,
+    multistate_output,
+    multistate_value,
+)
+from BAC0.core.devices.local.object import ObjectFactory
+
+BACNET_DEVICE = 24
+LOCALHOST = "127.0.0.1"
+WORKING_DIR = os.environ.get("WORKING_DIR", os.getcwd())
+MODEL_SCHEMA_PATH = f"{WORKING_DIR}/model_schema.yaml"
+
+OBJECT_MODELS = {
+    "analogInput": analog_input,
+    "analogOutput": analog_output,
+    "analogValue": analog_value,
+    "binaryInput": binary_input,
+    "binaryOutput": binary_output,
+    "binaryValue": binary_value,
+    "multiStateInput": multistate_input,
+    "multiStateOutput": multistate_output,
+    "multiStateValue": multistate_value,
+}
+BINARY_POINT_PATTERN = re.compile(r"(status|alarm|maintenance|mode)")
+
+
+def build_synthetic_site_config(n_servers, n_points, model_schema, seed=0):
+    """
+    Build a synthetic site config with n_servers BACnet servers exposing about n_points points each.
+    Devices are drawn from the model schema so the generated config also passes check_site_config.py.
+    """
+    rng = random.Random(seed)
+    models = [model for model, points in model_schema.items() if points]
+    read_devices = {}
+
+    for server_idx in range(n_servers):
+        bacnet_ip = f"10.{server_idx // 250}.{server_idx % 250}.10"
+        instances = {}
+        server_points = 0
+        dev_idx = 0
+
+        while server_points < n_points:
+            model = rng.choice(models)
+            dev_id = f"{model}_{server_idx + 1}_{dev_idx + 1}"
+            points = {}
+            for p_name in model_schema[model]:
+                obj_type = "binaryValue" if BINARY_POINT_PATTERN.search(p_name) else "analogValue"
+                instances[obj_type] = instances.get(obj_type, 0) + 1
+                points[p_name] = f"{obj_type} {instances[obj_type]}"
+                server_points += 1
+                if server_points >= n_points:
+                    break
+
+            read_devices[dev_id] = {
+                "model": model,
+                "servers": [{"bacnet_ip": bacnet_ip, "points": points}],
+            }
+            dev_idx += 1
+
+    return {
+        "site_id": f"synthetic-{n_servers}x{n_points}",
+        "timezone": "Asia/Bangkok",
+        "deployment_config": {"enabled_services": {}},
+        "site_metadata": {"site_name": "Synthetic BACnet site", "initial_date": "2024-01-01"},
+        "volttron_agents": {
+            "bacnet": {
+                "ip_address": f"{LOCALHOST}/8",
+                "interval": 60,
+                "read_devices": read_devices,
+                "write_devices": {},
+            }
+        },
+    }
+
+
+def collect_server_points(bacnet_agent_config: dict):
+    """
+    Group every configured point by BACnet server IP.
+    Returns {bacnet_ip: {(device_id, datapoint): (object_type, instance)}}.
+    """
+    server_points = {}
+    for devices_key in ["read_devices", "write_devices"]:
+        for dev_id, dev_info in (bacnet_agent_config.get(devices_key) or {}).items():
+            for server in dev_info["servers"]:
+                points = server_points.setdefault(server["bacnet_ip"], {})
+                for p_name, p_address in server["points"].items():
+                    obj_type, instance = p_address.split()
+                    points[(dev_id, p_name)] = (obj_type, int(instance))
+    return server_points
+
+
+def apply_point_faults(points: dict, rename_ratio: float, duplicate_ratio: float, rng: random.Random):
+    """
+    Rename and duplicate a random subset of points to mimic firmware re-addressing or bad exports.
+    Returns (objects, duplicates): the (object_name, object_type, instance) exported by the server and
+    the (device_id, datapoint, object_type, instance) to export from its duplicate server.
+    """
+    objects = []
+    duplicates = []
+    next_instance = {}
+    for (dev_id, p_name), (obj_type, instance) in points.items():
+        next_instance[obj_type] = max(next_instance.get(obj_type, 0), instance)
+
+    for (dev_id, p_name), (obj_type, instance) in points.items():
+        if rng.random() < rename_ratio:
+            logging.info(f" [{dev_id}] Renaming point {p_name} -> {p_name}_renamed")
+            p_name = f"{p_name}_renamed"
+        elif rng.random() < duplicate_ratio:
+            # BAC0 renames duplicate object names within a device, so the copy lives on another device
+            next_instance[obj_type] += 1
+            logging.info(f" [{dev_id}] Duplicating point {p_name} at {obj_type} {next_instance[obj_type]} on a second server")
+            duplicates.append((dev_id, p_name, obj_type, next_instance[obj_type]))
+        objects.append((f"{dev_id}.{p_name}", obj_type, instance))
+
+    return objects, duplicates
+
+
+def serve_virtual_device(port: int, objects: list, ready):
+    """
+    Run a BAC0 device on localhost:port exposing the given objects until the process is terminated.
+    """
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        device = BAC0.lite(ip=f"{LOCALHOST}/8", port=port, deviceId=BACNET_DEVICE)
+        ObjectFactory.clear_objects()
+        for object_name, obj_type, instance in objects:
+            if obj_type not in OBJECT_MODELS:
+                raise ValueError(f"Unsupported BACnet object type '{obj_type}' for point {object_name}")
+            OBJECT_MODELS[obj_type](instance=instance, name=object_name, presentValue=0)
+        ObjectFactory.add_objects_to_application(device)
+    except Exception as e:
+        ready.put(f"{type(e).__name__}: {e}")
+        raise
+    ready.put(None)
+
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        device.disconnect()
+
+
+def start_virtual_device(port: int, objects: list) -> multiprocessing.Process:
+    """
+    Start a virtual device process on localhost:port and wait until it is serving.
+    """
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_virtual_device, args=(port, objects, ready), daemon=True)
+    process.start()
+    try:
+        error = ready.get(timeout=120)
+    except queue.Empty:
+        error = 'timed out' if process.is_alive() else f'exited with code {process.exitcode}'
+        process.terminate()
+    if error:
+        process.join()
+        raise RuntimeError(f"Virtual device on port {port} failed to start: {error}")
+    return process
+
+
+class FaultInjectingProxy(asyncio.DatagramProtocol):
+    """
+    UDP proxy in front of a virtual device that injects latency, packet loss and duplicate packets.
+    Every client gets its own upstream socket so responses can be routed back to it.
+    """
+
+    def __init__(self, target_port, latency_ms, jitter_ms, loss_rate, duplicate_rate, rng):
+        self.target = (LOCALHOST, target_port)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss_rate = loss_rate
+        self.duplicate_rate = duplicate_rate
+        self.rng = rng
+        self.transport = None
+        self.upstreams = {}
+        self.stats = {"forwarded": 0, "dropped": 0, "duplicated": 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        loop = asyncio.get_running_loop()
+        if addr not in self.upstreams:
+            self.upstreams[addr] = loop.create_task(self._open_upstream(addr))
+        loop.create_task(self._send_upstream(data, addr))
+
+    async def _open_upstream(self, client_addr):
+        proxy = self
+
+        class Upstream(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                proxy.send_with_faults(lambda payload: proxy.transport.sendto(payload, client_addr), data)
+
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            Upstream, remote_addr=self.target
+        )
+        return transport
+
+    async def _send_upstream(self, data, client_addr):
+        upstream = await self.upstreams[client_addr]
+        self.send_with_faults(upstream.sendto, data)
+
+    def send_with_faults(self, send, data):
+        if self.rng.random() < self.loss_rate:
+            self.stats["dropped"] += 1
+            return
+
+        copies = 1
+        if self.rng.random() < self.duplicate_rate:
+            copies = 2
+            self.stats["duplicated"] += 1
+
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        loop = asyncio.get_running_loop()
+        for _ in range(copies):
+            loop.call_later(delay, send, data)
+        self.stats["forwarded"] += 1
+
+
+async def run_proxies(proxy_ports: dict, args, rng):
+    """
+    Start one fault-injecting proxy per virtual device and report packet statistics periodically.
+    """
+    loop = asyncio.get_running_loop()
+    proxies = {}
+    for proxy_port, device_port in proxy_ports.items():
+        proxy = FaultInjectingProxy(device_port, args.latency_ms, args.jitter_ms, args.loss_rate, args.duplicate_rate, rng)
+        await loop.create_datagram_endpoint(lambda proxy=proxy: proxy, local_addr=(LOCALHOST, proxy_port))
+        proxies[proxy_port] = proxy
+
+    print(f"✅ Simulating {len(proxies)} BACnet servers on {LOCALHOST}:{min(proxies)}-{max(proxies)}. Press Ctrl+C to stop.")
+    while True:
+        await asyncio.sleep(args.stats_interval)
+        totals = {key: sum(proxy.stats[key] for proxy in proxies.values()) for key in ["forwarded", "dropped", "duplicated"]}
+        logging.info(f"Proxy packets: {totals}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the BACnet/IP servers of a site config on localhost.')
+    parser.add_argument('site_id', nargs='?', help='Id of the site configuration to simulate.')
+    parser.add_argument('--synthetic', help='Generate a synthetic site instead, e.g. 50x2000 (servers x points per server).')
+    parser.add_argument('--base-port', type=int, default=47809, help='First localhost port used by the virtual devices.')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency added to every packet.')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Uniform jitter added around the latency.')
+    parser.add_argument('--loss-rate', type=float, default=0.0, help='Probability of dropping a packet.')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='Probability of sending a packet twice.')
+    parser.add_argument('--rename-ratio', type=float, default=0.0, help='Ratio of points exported under a different name.')
+    parser.add_argument('--duplicate-point-ratio', type=float, default=0.0, help='Ratio of points exported at two addresses.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible fault injection.')
+    parser.add_argument('--stats-interval', type=float, default=30.0, help='Seconds between proxy statistics reports.')
+    parser.add_argument('--write-config', help='Write a copy of the site config pointing at the simulated servers.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    rng = random.Random(args.seed)
+
+    if args.synthetic:
+        n_servers, n_points = (int(value) for value in args.synthetic.lower().split('x'))
+        model_schema = yaml.safe_load(open(MODEL_SCHEMA_PATH, 'r'))
+        site_config = build_synthetic_site_config(n_servers, n_points, model_schema, args.seed)
+    elif args.site_id:
+        site_id = args.site_id[:-5] if args.site_id.endswith('.yaml') else args.site_id
+        site_config = yaml.safe_load(open(f"{WORKING_DIR}/site_configs/{site_id}.yaml", 'r'))
+    else:
+        parser.error('Either site_id or --synthetic is required')
+
+    bacnet_agent_config = site_config['volttron_agents']['bacnet']
+    server_points = collect_server_points(bacnet_agent_config)
+
+    # Virtual devices listen on base_port + 2i, their fault-injecting proxies on base_port + 2i + 1
+    virtual_servers = []
+    for bacnet_ip, points in sorted(server_points.items()):
+        objects, duplicates = apply_point_faults(points, args.rename_ratio, args.duplicate_point_ratio, rng)
+        virtual_servers.append((bacnet_ip, objects, []))
+        if duplicates:
+            duplicate_objects = [(f"{dev_id}.{p_name}", obj_type, instance) for dev_id, p_name, obj_type, instance in duplicates]
+            virtual_servers.append((f"{bacnet_ip}-duplicates", duplicate_objects, duplicates))
+
+    server_addresses = {}
+    proxy_ports = {}
+    processes = []
+    start = time.perf_counter()
+    try:
+        for server_idx, (bacnet_ip, objects, _) in enumerate(virtual_servers):
+            device_port = args.base_port + 2 * server_idx
+            proxy_port = device_port + 1
+            processes.append(start_virtual_device(device_port, objects))
+            server_addresses[bacnet_ip] = f"{LOCALHOST}:{proxy_port}"
+            proxy_ports[proxy_port] = device_port
+            logging.info(f"Server {bacnet_ip} -> {server_addresses[bacnet_ip]} ({len(objects)} points)")
+        print(f"Started {len(processes)} virtual devices in {time.perf_counter() - start:.1f}s")
+
+        if args.write_config:
+            bacnet_agent_config['ip_address'] = f"{LOCALHOST}/8"
+            for devices_key in ["read_devices", "write_devices"]:
+                for dev_info in (bacnet_agent_config.get(devices_key) or {}).values():
+                    for server in dev_info['servers']:
+                        server['bacnet_ip'] = server_addresses[server['bacnet_ip']]
+
+            # Configure the duplicate servers as extra servers of the devices they duplicate points of
+            for bacnet_ip, _, duplicates in virtual_servers:
+                for dev_id, p_name, obj_type, instance in duplicates:
+                    for devices_key in ["read_devices", "write_devices"]:
+                        dev_info = (bacnet_agent_config.get(devices_key) or {}).get(dev_id)
+                        if dev_info is None:
+                            continue
+                        servers = [server for server in dev_info['servers'] if server['bacnet_ip'] == server_addresses[bacnet_ip]]
+                        if not servers:
+                            servers.append({'bacnet_ip': server_addresses[bacnet_ip], 'points': {}})
+                            dev_info['servers'].append(servers[0])
+                        servers[0]['points'][p_name] = f"{obj_type} {instance}"
+
+            with open(args.write_config, 'w') as f:
+                yaml.dump(site_config, f, default_flow_style=False, sort_keys=False)
+            print(f"✅ Wrote simulated site config to {args.write_config}")
+
+        asyncio.run(run_proxies(proxy_ports, args, rng))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
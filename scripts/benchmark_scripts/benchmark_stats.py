@@ -0,0 +1,11 @@
+"""
+Statistics helpers shared by the benchmark scripts.
+"""
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
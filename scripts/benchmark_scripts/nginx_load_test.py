@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Nginx Proxy Load Test
+
+Sends concurrent keep-alive GET requests to one or more proxy base URLs and reports throughput,
+p50/p95 latency and bytes on the wire, so the stock nginx.conf and the tuned profile from
+generate_nginx_conf.py can be compared on the same paths.
+
+To run both profiles side by side, start a second proxy with the tuned profile on another port:
+    docker run --rm -d --name nginx-proxy-tuned --network azure-iot-edge -p 8080:80 \\
+        -v $WORKING_DIR/nginx.tuned.conf:/etc/nginx/conf.d/default.conf nginx:alpine
+
+To mimic the site VPN, add latency on the loopback interface first, e.g.:
+    sudo tc qdisc add dev lo root netem delay 40ms
+
+Usage:
+    python nginx_load_test.py --base-url http://localhost --base-url http://localhost:8080 \\
+        --path / --path /api/ --path /assets/index.js [--concurrency 16] [--requests 500]
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark_stats import percentile
+
+
+def worker(base_url: str, paths: list, n_requests: int, results: list, lock: threading.Lock):
+    """Send n_requests over a single keep-alive connection, cycling through the paths."""
+    url = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(url.hostname, url.port, timeout=30)
+    headers = {'Accept-Encoding': 'gzip'}
+    local_results = []
+
+    for i in range(n_requests):
+        path = paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            connection.request('GET', f"{url.path.rstrip('/')}{path}", headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            local_results.append((path, response.status, time.perf_counter() - start, len(body)))
+        except (OSError, http.client.HTTPException):
+            local_results.append((path, None, time.perf_counter() - start, 0))
+            connection.close()
+
+    connection.close()
+    with lock:
+        results.extend(local_results)
+
+
+def run_load_test(base_url: str, paths: list, concurrency: int, n_requests: int):
+    """Run the load test against one base URL and return (results, elapsed seconds)."""
+    results = []
+    lock = threading.Lock()
+    per_worker = max(1, n_requests // concurrency)
+    threads = [
+        threading.Thread(target=worker, args=(base_url, paths, per_worker, results, lock))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def print_report(base_url: str, results: list, elapsed: float):
+    """Print the overall and per-path statistics of one load test."""
+    errors = sum(1 for _, status, _, _ in results if status is None or status >= 400)
+    latencies = [latency for _, _, latency, _ in results]
+    print(f"\n{base_url}: {len(results) / elapsed:.1f} req/s, errors {errors}/{len(results)}, "
+          f"p50 {percentile(latencies, 50) * 1000:.1f} ms, p95 {percentile(latencies, 95) * 1000:.1f} ms")
+    for path in sorted({path for path, _, _, _ in results}):
+        path_results = [r for r in results if r[0] == path]
+        path_latencies = [latency for _, _, latency, _ in path_results]
+        avg_bytes = sum(size for _, _, _, size in path_results) / len(path_results)
+        print(f"  {path:<40} p50 {percentile(path_latencies, 50) * 1000:7.1f} ms  "
+              f"p95 {percentile(path_latencies, 95) * 1000:7.1f} ms  {avg_bytes:9.0f} B/response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare nginx proxy profiles under concurrent load.')
+    parser.add_argument('--base-url', action='append', required=True, help='Proxy base URL, can be repeated.')
+    parser.add_argument('--path', action='append', default=None, help='Path to request, can be repeated (default: /).')
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent keep-alive clients.')
+    parser.add_argument('--requests', type=int, default=500, help='Total requests per base URL.')
+    args = parser.parse_args()
+
+    paths = args.path or ['/']
+    for base_url in args.base_url:
+        results, elapsed = run_load_test(base_url, paths, args.concurrency, args.requests)
+        print_report(base_url, results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
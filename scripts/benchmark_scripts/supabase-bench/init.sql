@@ -0,0 +1,22 @@
+-- Tables written by supabase_flush_benchmark.py
+-- bench_latest_data mirrors a latest-value table (upserts), bench_raw_data an append-only history (inserts)
+
+create table if not exists public.bench_latest_data (
+    device_id text not null,
+    datapoint text not null,
+    value double precision,
+    timestamp timestamptz not null,
+    primary key (device_id, datapoint)
+);
+
+create table if not exists public.bench_raw_data (
+    id bigserial primary key,
+    device_id text not null,
+    datapoint text not null,
+    value double precision,
+    timestamp timestamptz not null
+);
+
+grant usage on schema public to anon;
+grant select, insert, update, delete, truncate on public.bench_latest_data, public.bench_raw_data to anon;
+grant usage on all sequences in schema public to anon;
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Supabase Agent Flush Interval Benchmark
+
+Replays a synthetic point stream sized from a site config into a local PostgREST/Postgres
+stand-in (see supabase-bench/docker-compose.yml) for every combination of flush interval and
+batch size, and measures rows/sec, request count, p95 request latency and DB CPU. Among the
+settings whose worst-case data staleness (flush interval + p95 latency) stays within
+--max-staleness and whose DB CPU stays within --max-db-cpu, the best one is the one with the
+lowest measured DB CPU, then the lowest p95 latency. By default the flush intervals tried are
+spread over the staleness budget, so every interval tried can be recommended.
+
+In upsert mode each batch is deduplicated by (device_id, datapoint), keeping the latest value,
+since Postgres rejects an upsert that touches the same row twice.
+
+The point stream follows the BACnet agent: every configured device publishes all of its
+points once per 'interval' seconds, with devices spread evenly over the interval.
+
+Usage:
+    python supabase_flush_benchmark.py <site_id> [options]
+
+Example:
+    docker compose -f supabase-bench/docker-compose.yml up -d
+    python supabase_flush_benchmark.py cp9 --max-staleness 10 --batch-sizes 200 1000 --write-config
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+from benchmark_stats import percentile
+
+WORKING_DIR = os.environ.get("WORKING_DIR", os.getcwd())
+DB_CONTAINER = "bench-supabase-db"
+TABLES = {"upsert": "bench_latest_data", "insert": "bench_raw_data"}
+
+
+def load_point_stream(site_config: dict):
+    """
+    Return (devices, interval) where devices is a list of (device_id, [datapoints]) from the BACnet agent config.
+    """
+    bacnet_agent_config = site_config["volttron_agents"]["bacnet"]
+    devices = {}
+    for devices_key in ["read_devices", "write_devices"]:
+        for dev_id, dev_info in (bacnet_agent_config.get(devices_key) or {}).items():
+            points = devices.setdefault(dev_id, set())
+            for server in dev_info["servers"]:
+                points.update(server["points"].keys())
+    return [(dev_id, sorted(points)) for dev_id, points in devices.items()], bacnet_agent_config["interval"]
+
+
+class DbCpuSampler(threading.Thread):
+    """
+    Sample the CPU usage of the stand-in database container with docker stats.
+    """
+
+    def __init__(self, container):
+        super().__init__(daemon=True)
+        self.container = container
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            result = subprocess.run(
+                ["docker", "stats", "--no-stream", "--format", "{{.CPUPerc}}", self.container],
+                capture_output=True, text=True,
+            )
+            if result.returncode == 0 and result.stdout.strip():
+                self.samples.append(float(result.stdout.strip().rstrip('%')))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return sum(self.samples) / len(self.samples) if self.samples else float('nan')
+
+
+def reset_tables():
+    """Empty the benchmark tables between runs so every run starts from the same state."""
+    subprocess.run(
+        ["docker", "exec", DB_CONTAINER, "psql", "-U", "postgres", "-c",
+         f"truncate {', '.join(TABLES.values())}"],
+        check=True, capture_output=True,
+    )
+
+
+def run_benchmark(devices, interval, flush_interval, batch_size, duration, host, port, mode):
+    """
+    Replay the point stream for `duration` seconds, flushing the buffer every `flush_interval` seconds
+    in requests of at most `batch_size` rows. Returns the measured statistics.
+    """
+    path = f"/{TABLES[mode]}"
+    headers = {"Content-Type": "application/json", "Prefer": "return=minimal"}
+    if mode == "upsert":
+        path += "?on_conflict=device_id,datapoint"
+        headers["Prefer"] += ",resolution=merge-duplicates"
+
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    sampler = DbCpuSampler(DB_CONTAINER)
+    sampler.start()
+
+    buffer = []
+    latencies = []
+    rows_written = 0
+    errors = 0
+    offsets = [i * interval / len(devices) for i in range(len(devices))]
+    next_publish = list(offsets)
+    start = time.monotonic()
+    next_flush = start + flush_interval
+
+    while True:
+        now = time.monotonic()
+        elapsed = now - start
+        if elapsed >= duration:
+            break
+
+        # Devices publish all of their points once per BACnet interval
+        for i, (dev_id, points) in enumerate(devices):
+            if elapsed >= next_publish[i]:
+                timestamp = datetime.now(timezone.utc).isoformat()
+                buffer.extend(
+                    {"device_id": dev_id, "datapoint": p, "value": random.random(), "timestamp": timestamp}
+                    for p in points
+                )
+                next_publish[i] += interval
+
+        if now >= next_flush:
+            if mode == "upsert":
+                # Keep the latest value per row, a single upsert cannot update the same row twice
+                buffer = list({(row["device_id"], row["datapoint"]): row for row in buffer}.values())
+            for batch_start in range(0, len(buffer), batch_size):
+                batch = buffer[batch_start:batch_start + batch_size]
+                request_start = time.perf_counter()
+                connection.request("POST", path, body=json.dumps(batch), headers=headers)
+                response = connection.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - request_start)
+                if response.status >= 300:
+                    errors += 1
+                else:
+                    rows_written += len(batch)
+            buffer = []
+            next_flush += flush_interval
+
+        time.sleep(min(0.05, max(0.0, next_flush - time.monotonic())))
+
+    db_cpu = sampler.stop()
+    connection.close()
+    elapsed = time.monotonic() - start
+    p95_latency = percentile(latencies, 95)
+    return {
+        "flush_interval": flush_interval,
+        "batch_size": batch_size,
+        "rows_per_sec": rows_written / elapsed,
+        "requests": len(latencies),
+        "errors": errors,
+        "p95_latency_ms": p95_latency * 1000,
+        "db_cpu_percent": db_cpu,
+        "max_staleness_s": flush_interval + p95_latency,
+    }
+
+
+def recommend(results: list, max_staleness: float, max_db_cpu: float):
+    """
+    Pick the setting with the lowest measured DB CPU (then p95 latency) that meets the staleness and CPU limits.
+    """
+    candidates = [
+        r for r in results
+        if not r["errors"] and r["max_staleness_s"] <= max_staleness and not r["db_cpu_percent"] > max_db_cpu
+    ]
+    if not candidates:
+        return None
+    # Runs without CPU samples rank last instead of comparing as NaN
+    return min(candidates, key=lambda r: (
+        r["db_cpu_percent"] if r["db_cpu_percent"] == r["db_cpu_percent"] else float('inf'),
+        r["p95_latency_ms"],
+        r["flush_interval"],
+    ))
+
+
+def write_supabase_agent_settings(site_config_path: str, best: dict):
+    """Write the recommended flush interval into the Supabase agent config."""
+    with open(site_config_path, 'r') as file:
+        site_config = yaml.safe_load(file)
+
+    supabase_config = site_config.setdefault('volttron_agents', {}).setdefault('supabase', {})
+    supabase_config['flush_interval'] = best['flush_interval']
+
+    with open(site_config_path, 'w') as file:
+        yaml.dump(site_config, file, default_flow_style=False, sort_keys=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Supabase agent flush settings against a local stand-in.')
+    parser.add_argument('site_id', help='Id of the site configuration to size the point stream from.')
+    parser.add_argument('--flush-intervals', type=float, nargs='+', help='Flush intervals to try (seconds). Defaults to 20, 40, 60 and 80%% of --max-staleness.')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500, 1000], help='Maximum rows per request to try.')
+    parser.add_argument('--duration', type=float, default=60, help='Duration of each run (seconds).')
+    parser.add_argument('--mode', choices=TABLES.keys(), default='upsert', help='Write latest values (upsert) or history rows (insert).')
+    parser.add_argument('--host', default='localhost', help='PostgREST stand-in host.')
+    parser.add_argument('--port', type=int, default=54321, help='PostgREST stand-in port.')
+    parser.add_argument('--max-staleness', type=float, default=5, help='Maximum acceptable data staleness in the UI (seconds).')
+    parser.add_argument('--max-db-cpu', type=float, default=50, help='Maximum acceptable average DB CPU (percent).')
+    parser.add_argument('--write-config', action='store_true', help='Write the recommended settings into the site config.')
+    args = parser.parse_args()
+
+    if args.flush_intervals is None:
+        args.flush_intervals = [round(args.max_staleness * fraction, 2) for fraction in (0.2, 0.4, 0.6, 0.8)]
+
+    site_id = args.site_id[:-5] if args.site_id.endswith('.yaml') else args.site_id
+    site_config_path = f"{WORKING_DIR}/site_configs/{site_id}.yaml"
+    devices, interval = load_point_stream(yaml.safe_load(open(site_config_path, 'r')))
+    n_points = sum(len(points) for _, points in devices)
+    print(f"Replaying {n_points} points from {len(devices)} devices every {interval}s ({n_points / interval:.1f} rows/sec)")
+
+    results = []
+    for flush_interval in args.flush_intervals:
+        for batch_size in args.batch_sizes:
+            reset_tables()
+            result = run_benchmark(devices, interval, flush_interval, batch_size, args.duration, args.host, args.port, args.mode)
+            results.append(result)
+            print(f"flush_interval={flush_interval:>5}s batch_size={batch_size:>5}: "
+                  f"{result['rows_per_sec']:8.1f} rows/s, {result['requests']:5d} requests, "
+                  f"p95 {result['p95_latency_ms']:7.1f} ms, DB CPU {result['db_cpu_percent']:5.1f}%, "
+                  f"errors {result['errors']}")
+
+    best = recommend(results, args.max_staleness, args.max_db_cpu)
+    if best is None:
+        print("❌ No setting met the staleness and DB CPU limits")
+        return 1
+
+    print(f"✅ Recommended flush_interval={best['flush_interval']}s batch_size={best['batch_size']}")
+    if args.write_config:
+        write_supabase_agent_settings(site_config_path, best)
+        print(f"✅ Updated the Supabase agent flush_interval in {site_config_path}")
+        print(f"   batch_size is not a known Supabase agent setting, batch_size={best['batch_size']} was not written")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,279 @@
+"""
+BACnet Scanned-Point Snapshots
+
+Stores the result of a BACnet point scan as a compact, versioned snapshot per site and
+diffs snapshots against each other or against the site config. Snapshots are partitioned
+by device and every device carries a digest of its points, so a diff only looks inside the
+devices whose digest changed.
+
+Snapshots are written by check_exported_bacnet_points.py --save-snapshot to
+$WORKING_DIR/bacnet_snapshots/<site_id>/<timestamp>.json.gz
+With --streaming the snapshot is written server by server as a list of parts, which are
+merged into devices when the snapshot is loaded.
+
+Usage:
+    python bacnet_snapshot.py <site_id> list
+    python bacnet_snapshot.py <site_id> diff [old_snapshot] [new_snapshot]
+    python bacnet_snapshot.py <site_id> diff --against-config [snapshot]
+    python bacnet_snapshot.py <site_id> propose [snapshot] [--output points.yaml]
+"""
+
+import argparse
+import copy
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import yaml
+
+from compile_site_config import load_site_config
+
+SNAPSHOT_VERSION = 2
+SUPPORTED_SNAPSHOT_VERSIONS = (1, 2)
+WORKING_DIR = os.environ["WORKING_DIR"]
+SNAPSHOT_DIR = f"{WORKING_DIR}/bacnet_snapshots"
+
+
+def device_digest(points: dict) -> str:
+    """Digest of a device's {datapoint: point_address} mapping."""
+    return hashlib.sha1(json.dumps(points, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_snapshot(devices: dict, site_id: str, source: str) -> dict:
+    """Wrap a {device_id: {datapoint: point_address}} mapping into a versioned snapshot."""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'site_id': site_id,
+        'source': source,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'digests': {dev_id: device_digest(points) for dev_id, points in devices.items()},
+        'devices': devices,
+    }
+
+
+def add_scanned_points(devices: dict, scanned_df):
+    """
+    Add the scanned points dataframe (device_id, datapoint, point_address) to a {device_id: {datapoint: point_address}} mapping.
+    """
+    for dev_id, p_name, p_address in scanned_df[['device_id', 'datapoint', 'point_address']].itertuples(index=False):
+        points = devices.setdefault(dev_id, {})
+        if p_name in points:
+            logging.warning(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points, keeping {points[p_name]}")
+            continue
+        points[p_name] = p_address
+
+
+def snapshot_from_scan(scanned_df, site_id: str) -> dict:
+    """
+    Build a snapshot from the scanned points dataframe (device_id, datapoint, point_address).
+    """
+    devices = {}
+    add_scanned_points(devices, scanned_df)
+    return build_snapshot(devices, site_id, 'scan')
+
+
+def snapshot_from_config(bacnet_agent_config: dict, site_id: str) -> dict:
+    """
+    Build a snapshot from the read and write devices of the BACnet agent configuration.
+    """
+    devices = {}
+    for devices_key in ['read_devices', 'write_devices']:
+        for dev_id, dev_info in (bacnet_agent_config.get(devices_key) or {}).items():
+            points = devices.setdefault(dev_id, {})
+            for server in dev_info['servers']:
+                points.update(server['points'])
+    return build_snapshot(devices, site_id, 'config')
+
+
+def new_snapshot_path(site_id: str) -> str:
+    site_dir = os.path.join(SNAPSHOT_DIR, site_id)
+    os.makedirs(site_dir, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return os.path.join(site_dir, f'{timestamp}.json.gz')
+
+
+def save_snapshot(snapshot: dict, site_id: str) -> str:
+    """Write the snapshot to the site's snapshot directory and return its path."""
+    snapshot_path = new_snapshot_path(site_id)
+    with gzip.open(snapshot_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    return snapshot_path
+
+
+class SnapshotWriter:
+    """
+    Write a scan snapshot one server at a time, so the points of the whole site are never held in memory.
+    The snapshot only appears in the snapshot directory once it is closed.
+    """
+
+    def __init__(self, site_id: str):
+        self.snapshot_path = new_snapshot_path(site_id)
+        self.tmp_path = f'{self.snapshot_path}.tmp'
+        self.file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        header = {
+            'version': SNAPSHOT_VERSION,
+            'site_id': site_id,
+            'source': 'scan',
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        self.file.write(json.dumps(header, separators=(',', ':'))[:-1] + ',"parts":[')
+        self.parts = 0
+
+    def add_server(self, server_ip: str, scanned_df):
+        """Append the scanned points dataframe (device_id, datapoint, point_address) of one server."""
+        devices = {}
+        add_scanned_points(devices, scanned_df)
+        self.file.write((',' if self.parts else '') + json.dumps({'server': server_ip, 'devices': devices}, separators=(',', ':')))
+        self.parts += 1
+
+    def close(self) -> str:
+        """Finish the snapshot and return its path."""
+        self.file.write(']}')
+        self.file.close()
+        os.replace(self.tmp_path, self.snapshot_path)
+        return self.snapshot_path
+
+    def discard(self):
+        """Drop a snapshot that could not be completed."""
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+def list_snapshots(site_id: str) -> list:
+    """Return the site's snapshot paths, oldest first."""
+    site_dir = os.path.join(SNAPSHOT_DIR, site_id)
+    if not os.path.isdir(site_dir):
+        return []
+    return [os.path.join(site_dir, name) for name in sorted(os.listdir(site_dir)) if name.endswith('.json.gz')]
+
+
+def load_snapshot(snapshot_path: str) -> dict:
+    """Load a snapshot and check that its format version is supported."""
+    with gzip.open(snapshot_path, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('version') not in SUPPORTED_SNAPSHOT_VERSIONS:
+        raise ValueError(f"Unsupported snapshot version {snapshot.get('version')} in {snapshot_path}")
+
+    # Streamed snapshots hold one part per server, a device may be spread over several of them
+    if 'parts' in snapshot:
+        devices = {}
+        for part in snapshot.pop('parts'):
+            for dev_id, points in part['devices'].items():
+                device_points = devices.setdefault(dev_id, {})
+                for p_name, p_address in points.items():
+                    if p_name in device_points:
+                        logging.warning(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points, keeping {device_points[p_name]}")
+                        continue
+                    device_points[p_name] = p_address
+        snapshot['digests'] = {dev_id: device_digest(points) for dev_id, points in devices.items()}
+        snapshot['devices'] = devices
+    return snapshot
+
+
+def diff_snapshots(old: dict, new: dict) -> dict:
+    """
+    Compare two snapshots device by device.
+    Returns {device_id: {'added': {...}, 'removed': {...}, 'readdressed': {point: (old, new)}}} for changed devices only.
+    """
+    diff = {}
+    old_digests, new_digests = old['digests'], new['digests']
+
+    for dev_id in old_digests.keys() | new_digests.keys():
+        # Unchanged devices are skipped without looking at their points
+        if old_digests.get(dev_id) == new_digests.get(dev_id):
+            continue
+
+        old_points = old['devices'].get(dev_id, {})
+        new_points = new['devices'].get(dev_id, {})
+        common_points = old_points.keys() & new_points.keys()
+        diff[dev_id] = {
+            'added': {p: new_points[p] for p in new_points.keys() - old_points.keys()},
+            'removed': {p: old_points[p] for p in old_points.keys() - new_points.keys()},
+            'readdressed': {p: (old_points[p], new_points[p]) for p in common_points if old_points[p] != new_points[p]},
+        }
+    return diff
+
+
+def print_diff(diff: dict):
+    """Print a diff report and a summary line."""
+    totals = {'added': 0, 'removed': 0, 'readdressed': 0}
+    for dev_id in sorted(diff):
+        changes = diff[dev_id]
+        for p_name, p_address in sorted(changes['added'].items()):
+            print(f" [{dev_id}] + {p_name} ({p_address})")
+        for p_name, p_address in sorted(changes['removed'].items()):
+            print(f" [{dev_id}] - {p_name} ({p_address})")
+        for p_name, (old_address, new_address) in sorted(changes['readdressed'].items()):
+            print(f" [{dev_id}] ~ {p_name} ({old_address} -> {new_address})")
+        for key in totals:
+            totals[key] += len(changes[key])
+    print(f"{len(diff)} devices changed: {totals['added']} added, {totals['removed']} removed, {totals['readdressed']} re-addressed points")
+
+
+def propose_bacnet_config(bacnet_agent_config: dict, scan_snapshot: dict) -> dict:
+    """
+    Return a copy of the read/write devices with every configured point re-addressed to its scanned address.
+    Points missing from the scan are kept and reported, since they may only be temporarily unavailable.
+    """
+    proposed = {}
+    for devices_key in ['read_devices', 'write_devices']:
+        proposed[devices_key] = copy.deepcopy(bacnet_agent_config.get(devices_key) or {})
+        for dev_id, dev_info in proposed[devices_key].items():
+            scanned_points = scan_snapshot['devices'].get(dev_id, {})
+            for server in dev_info['servers']:
+                for p_name, p_address in server['points'].items():
+                    if p_name not in scanned_points:
+                        logging.warning(f" [{dev_id}] Point {p_name} not found in scanned points, keeping {p_address}")
+                    elif scanned_points[p_name] != p_address:
+                        server['points'][p_name] = scanned_points[p_name]
+    return proposed
+
+
+def resolve_snapshot(site_id: str, snapshot_arg, index: int) -> dict:
+    """Load the snapshot given on the command line, or the site's snapshot at the given index."""
+    if snapshot_arg:
+        return load_snapshot(snapshot_arg)
+    snapshots = list_snapshots(site_id)
+    if len(snapshots) < abs(index):
+        raise ValueError(f"Not enough snapshots for site '{site_id}' in {SNAPSHOT_DIR}/{site_id}")
+    return load_snapshot(snapshots[index])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage and diff BACnet scanned-point snapshots.')
+    parser.add_argument('site_id', type=str, help='Id of the site configuration to use.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List the saved snapshots of the site.')
+    diff_parser = subparsers.add_parser('diff', help='Diff two snapshots (default: the two latest).')
+    diff_parser.add_argument('old', nargs='?', help='Older snapshot path.')
+    diff_parser.add_argument('new', nargs='?', help='Newer snapshot path.')
+    diff_parser.add_argument('--against-config', action='store_true', help='Diff the site config against a snapshot (default: the latest).')
+    propose_parser = subparsers.add_parser('propose', help='Propose BACnet devices re-addressed to a snapshot (default: the latest).')
+    propose_parser.add_argument('snapshot', nargs='?', help='Snapshot path.')
+    propose_parser.add_argument('--output', help='Write the proposed devices YAML to this file instead of stdout.')
+    args = parser.parse_args()
+
+    SITE_ID = args.site_id[:-5] if args.site_id.endswith('.yaml') else args.site_id
+
+    if args.command == 'list':
+        for snapshot_path in list_snapshots(SITE_ID):
+            print(snapshot_path)
+    else:
+        bacnet_agent_config = load_site_config(SITE_ID)['volttron_agents']['bacnet']
+
+        if args.command == 'diff' and args.against_config:
+            print_diff(diff_snapshots(snapshot_from_config(bacnet_agent_config, SITE_ID), resolve_snapshot(SITE_ID, args.old, -1)))
+        elif args.command == 'diff':
+            print_diff(diff_snapshots(resolve_snapshot(SITE_ID, args.old, -2), resolve_snapshot(SITE_ID, args.new, -1)))
+        else:
+            proposed = propose_bacnet_config(bacnet_agent_config, resolve_snapshot(SITE_ID, args.snapshot, -1))
+            proposed_yaml = yaml.dump(proposed, default_flow_style=False, sort_keys=False)
+            if args.output:
+                with open(args.output, 'w') as f:
+                    f.write(proposed_yaml)
+                print(f"✅ Wrote proposed BACnet devices to {args.output}")
+            else:
+                print(proposed_yaml)
@@ -1,122 +1,246 @@
 import argparse
+import gc
+import json
 import logging
+import time
 
 import BAC0
 import pandas as pd
-import yaml
 import os
 
+from bacnet_snapshot import SnapshotWriter, save_snapshot, snapshot_from_scan
+from compile_site_config import load_compiled_site_config
+
 BACNET_DEVICE = 24
 WORKING_DIR = os.environ["WORKING_DIR"]
+METRICS_PATH = f"{WORKING_DIR}/metrics/bacnet_check.json"
 
 
-def check_config_and_scanned_points(read_devices_config: dict, write_devices_config: dict, scanned_df: pd.DataFrame):
+def check_device_points(dev_id: str, points: dict, scanned_df_each_dev: pd.DataFrame) -> int:
     """
-    Validate the configuration of the BACnet agent and the actual points exported from the BACnet device.
+    Compare the configured points of one device server with the scanned points of that device. Returns the number of errors.
     """
     error_count = 0
-    scanned_dev_ids = set(scanned_df['device_id'].unique())
-    
-    config_dev_ids = set(read_devices_config.keys()) | set(write_devices_config.keys())
-
+    for p_name, p_address in points.items():
+        p_data = scanned_df_each_dev[scanned_df_each_dev['datapoint'] == p_name]
+
+        if p_data.empty:
+            error_count += 1
+            logging.error(f" [{dev_id}] Point {p_name} not found in scanned points")
+        elif len(p_data) > 1:
+            error_count += 1
+            logging.error(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points")
+        else:
+            scanned_p_address = p_data['point_address'].item()
+            if p_address != scanned_p_address:
+                error_count += 1
+                logging.error(f" [{dev_id}] Point {p_name} address in BACnet device ({scanned_p_address}) is different from the configuration ({p_address})")
+    return error_count
+
+
+def check_device_ids(config_dev_ids: set, scanned_dev_ids: set) -> int:
+    """
+    Compare the configured and scanned device ids. Returns the number of errors.
+    """
     if scanned_dev_ids - config_dev_ids:
         logging.warning(f"Scanned devices not in YAML config: {scanned_dev_ids - config_dev_ids}")
     if config_dev_ids - scanned_dev_ids:
-        error_count += 1
         logging.error(f"Configured devices not in scanned BACnet device: {config_dev_ids - scanned_dev_ids}")
-    
-    # Check read devices
-    for dev_id, dev_info in read_devices_config.items():
-        for server in dev_info['servers']:
-            points = server['points']
-            scanned_df_each_dev = scanned_df[scanned_df['device_id'] == dev_id]
+        return 1
+    return 0
 
-            for p_name, p_address in points.items():
-                p_data = scanned_df_each_dev[scanned_df_each_dev['datapoint'] == p_name]
-
-                if p_data.empty:
-                    error_count += 1
-                    logging.error(f" [{dev_id}] Point {p_name} not found in scanned points")
-                elif len(p_data) > 1:
-                    error_count += 1
-                    logging.error(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points")
-                else:
-                    scanned_p_address = p_data['point_address'].item()
-                    if p_address != scanned_p_address:
-                        error_count += 1
-                        logging.error(f" [{dev_id}] Point {p_name} address in BACnet device ({scanned_p_address}) is different from the configuration ({p_address})")
-
-    # Check write devices  
-    for dev_id, dev_info in write_devices_config.items():
-        for server in dev_info['servers']:
-            points = server['points']
-            scanned_df_each_dev = scanned_df[scanned_df['device_id'] == dev_id]
 
-            for p_name, p_address in points.items():
-                p_data = scanned_df_each_dev[scanned_df_each_dev['datapoint'] == p_name]
-
-                if p_data.empty:
-                    error_count += 1
-                    logging.error(f" [{dev_id}] Point {p_name} not found in scanned points")
-                elif len(p_data) > 1:
-                    error_count += 1
-                    logging.error(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points")
-                else:
-                    scanned_p_address = p_data['point_address'].item()
-                    if p_address != scanned_p_address:
-                        error_count += 1
-                        logging.error(f" [{dev_id}] Point {p_name} address in BACnet device ({scanned_p_address}) is different from the configuration ({p_address})")
-    
+def report_check_result(error_count: int):
     if error_count:
         raise ValueError(f"Found {error_count} errors in the BACnet configuration and scanned points. Please solve them before proceeding.")
     else:
         print("BACnet configuration and scanned points are consistent!!!")
 
 
+def check_config_and_scanned_points(read_devices_config: dict, write_devices_config: dict, scanned_df: pd.DataFrame):
+    """
+    Validate the configuration of the BACnet agent and the actual points exported from the BACnet device.
+    """
+    config_dev_ids = set(read_devices_config.keys()) | set(write_devices_config.keys())
+    error_count = check_device_ids(config_dev_ids, set(scanned_df['device_id'].unique()))
+
+    # Check read and write devices
+    for devices_config in [read_devices_config, write_devices_config]:
+        for dev_id, dev_info in devices_config.items():
+            scanned_df_each_dev = scanned_df[scanned_df['device_id'] == dev_id]
+            for server in dev_info['servers']:
+                error_count += check_device_points(dev_id, server['points'], scanned_df_each_dev)
+
+    report_check_result(error_count)
+
+
+def check_config_and_scanned_points_streaming(read_devices_config: dict, write_devices_config: dict, server_devices: dict,
+                                              scanned_servers, snapshot_writer: SnapshotWriter = None):
+    """
+    Validate the configuration server by server while the scan is running. Each server's points are only compared
+    against the configured points of that server and released before the next server is scanned, so memory is
+    bounded by the largest server instead of the whole site. The configured datapoints already scanned on earlier
+    servers are kept per device, so a datapoint exported by several servers of a device is still reported.
+    server_devices is the {bacnet_ip: [device_id, ...]} index of the compiled site config. When snapshot_writer
+    is given, each server's scanned points are written to it before they are released.
+    Returns (error_count, scanned_points).
+    """
+    error_count = 0
+    scanned_points = 0
+    scanned_dev_ids = set()
+    seen_points = {}
+
+    for server_ip, scanned_df in scanned_servers:
+        scanned_points += len(scanned_df)
+        scanned_dev_ids.update(scanned_df['device_id'].unique())
+        if snapshot_writer is not None:
+            snapshot_writer.add_server(server_ip, scanned_df)
+
+        scanned_dfs_by_dev = dict(tuple(scanned_df.groupby('device_id')))
+        for dev_id in server_devices.get(server_ip, []):
+            scanned_df_each_dev = scanned_dfs_by_dev.get(dev_id, scanned_df.iloc[0:0])
+            for devices_config in [read_devices_config, write_devices_config]:
+                for server in devices_config.get(dev_id, {}).get('servers', []):
+                    if server['bacnet_ip'] == server_ip:
+                        error_count += check_device_points(dev_id, server['points'], scanned_df_each_dev)
+
+        # Points repeated within this server are reported above, points repeated across servers here
+        for dev_id, scanned_df_each_dev in scanned_dfs_by_dev.items():
+            configured_points = set()
+            for devices_config in [read_devices_config, write_devices_config]:
+                for server in devices_config.get(dev_id, {}).get('servers', []):
+                    configured_points.update(server['points'])
+            server_points = set(scanned_df_each_dev['datapoint']) & configured_points
+            seen = seen_points.setdefault(dev_id, set())
+            for p_name in sorted(server_points & seen):
+                error_count += 1
+                logging.error(f" [{dev_id}] Point {p_name} has multiple addresses in scanned points")
+            seen.update(server_points)
+
+        # Release this server's points before scanning the next one
+        del scanned_df, scanned_dfs_by_dev
+        gc.collect()
+
+    config_dev_ids = set(read_devices_config.keys()) | set(write_devices_config.keys())
+    error_count += check_device_ids(config_dev_ids, scanned_dev_ids)
+    return error_count, scanned_points
+
+
+def iter_scanned_servers(host_ip_address: str, server_ips: set):
+    """
+    Scan the BACnet servers one at a time and yield (server_ip, dataframe) with device_id, datapoint and point_address columns.
+    """
+    # Initialize BAC0 client
+    client = BAC0.lite(ip=host_ip_address, port=0xBAC0)
+    
+    # Get and preprocess points dataframe from all BACnet devices
+    for server_ip in server_ips:
+        # Only the point properties are read, so the device is not polled and is dropped from the client right away
+        bacnet_dev = BAC0.device(server_ip, BACNET_DEVICE, client, poll=0)
+        if isinstance(bacnet_dev, BAC0.core.devices.Device.DeviceDisconnected):
+            raise ValueError(f"Failed to connect to BACnet device at {server_ip}")
+            
+        # Trim to the compared columns right away, so the full property frame is not kept while the caller works
+        properties_df = bacnet_dev.points_properties_df().transpose()
+        bacnet_dev.disconnect(save_on_disconnect=False)
+        del bacnet_dev
+        names = properties_df['name'].astype(str).str.split('.')
+        df = pd.DataFrame({
+            'device_id': names.str[-2],
+            'datapoint': names.str[-1],
+            'point_address': properties_df['type'].astype(str) + ' ' + properties_df['address'].astype(str),
+        }).reset_index(drop=True)
+        del properties_df, names
+        yield server_ip, df
+        del df
+
+
+def scan_bacnet_points(host_ip_address: str, server_ips: set) -> pd.DataFrame:
+    """
+    Scan every BACnet server and return its points as a dataframe with device_id, datapoint and point_address columns.
+    """
+    all_dfs = [df for _, df in iter_scanned_servers(host_ip_address, server_ips)]
+    
+    # Concatenate all dataframes
+    return pd.concat(all_dfs, ignore_index=True)
+
+
+def write_check_metrics(metrics: dict):
+    """
+    Write the metrics of the last BACnet check for the metrics exporter.
+    """
+    os.makedirs(os.path.dirname(METRICS_PATH), exist_ok=True)
+    with open(METRICS_PATH, 'w') as f:
+        json.dump(metrics, f)
+
+
 if __name__ == '__main__':
 
     # Set up argparse to accept the site_id argument
     parser = argparse.ArgumentParser(description='Install Volttron agents with specified configuration.')
     parser.add_argument('site_id', type=str, help='Id of the site configuration to use.')
+    parser.add_argument('--save-snapshot', action='store_true', help='Save the scanned points as a versioned snapshot of the site.')
+    parser.add_argument('--streaming', action='store_true', help='Check each server as soon as it is scanned to bound memory on very large sites.')
 
     # Parse the arguments and load config file
     args = parser.parse_args()
     SITE_ID = args.site_id
     if SITE_ID.endswith('.yaml'):
         SITE_ID = SITE_ID[:-5]
-    bacnet_config_path = f'{WORKING_DIR}/site_configs/{SITE_ID}.yaml'
-    bacnet_agent_config = yaml.safe_load(open(bacnet_config_path))['volttron_agents']['bacnet']
+    site_config_artifact = load_compiled_site_config(SITE_ID)
+    bacnet_agent_config = site_config_artifact['site_config']['volttron_agents']['bacnet']
     read_devices_config = bacnet_agent_config['read_devices']
     write_devices_config = bacnet_agent_config['write_devices']
     host_ip_address = bacnet_agent_config['ip_address']
 
     # Get unique server IPs from both read and write devices
-    server_ips = set()
-    for devices in [read_devices_config.values(), write_devices_config.values()]:
-        for dev in devices:
-            for server in dev['servers']:
-                server_ips.add(server['bacnet_ip'])
-
-    # Initialize BAC0 client
-    client = BAC0.lite(ip=host_ip_address, port=0xBAC0)
-    
-    # Get and preprocess points dataframe from all BACnet devices
-    all_dfs = []
-    for server_ip in server_ips:
-        bacnet_dev = BAC0.device(server_ip, BACNET_DEVICE, client)
-        if isinstance(bacnet_dev, BAC0.core.devices.Device.DeviceDisconnected):
-            raise ValueError(f"Failed to connect to BACnet device at {server_ip}")
-            
-        df = bacnet_dev.points_properties_df()
-        df = df.transpose()
-        df['device_id'] = df['name'].apply(lambda x: x.split('.')[-2])
-        df['datapoint'] = df['name'].apply(lambda x: x.split('.')[-1])
-        df['point_address'] = df.apply(lambda row: f"{row['type']} {row['address']}", axis=1)
-        df = df[['device_id', 'datapoint', 'point_address']]
-        all_dfs.append(df)
-    
-    # Concatenate all dataframes
-    df = pd.concat(all_dfs, ignore_index=True)
-    
-    # Check configuration and scanned points
-    check_config_and_scanned_points(read_devices_config, write_devices_config, df)
+    server_ips = set(site_config_artifact['index']['servers'])
+
+    # Scanning and checking are interleaved with --streaming, so the scan duration is only known once the check is done
+    start = time.time()
+    scanned_points = 0
+    scan_duration = None
+    passed = False
+    snapshot_writer = None
+    try:
+        if args.streaming:
+            snapshot_writer = SnapshotWriter(SITE_ID) if args.save_snapshot else None
+            error_count, scanned_points = check_config_and_scanned_points_streaming(
+                read_devices_config, write_devices_config, site_config_artifact['index']['servers'],
+                iter_scanned_servers(host_ip_address, server_ips), snapshot_writer,
+            )
+            if snapshot_writer is not None:
+                print(f"Saved scanned points snapshot to {snapshot_writer.close()}")
+                snapshot_writer = None
+            report_check_result(error_count)
+        else:
+            df = scan_bacnet_points(host_ip_address, server_ips)
+            scanned_points = len(df)
+            scan_duration = time.time() - start
+
+            # Keep the scan history before checking so failing scans can be diffed too
+            if args.save_snapshot:
+                snapshot_path = save_snapshot(snapshot_from_scan(df, SITE_ID), SITE_ID)
+                print(f"Saved scanned points snapshot to {snapshot_path}")
+
+            # Check configuration and scanned points
+            check_config_and_scanned_points(read_devices_config, write_devices_config, df)
+        passed = True
+    finally:
+        # A scan that failed part way leaves an incomplete snapshot
+        if snapshot_writer is not None:
+            snapshot_writer.discard()
+        check_duration = time.time() - start
+        write_check_metrics({
+            'timestamp': start,
+            'servers': len(server_ips),
+            'scanned_points': scanned_points,
+            'configured_points': sum(
+                len(server['points'])
+                for devices in [read_devices_config.values(), write_devices_config.values()]
+                for dev in devices for server in dev['servers']
+            ),
+            'scan_duration_seconds': check_duration if scan_duration is None else scan_duration,
+            'check_duration_seconds': check_duration,
+            'passed': passed,
+        })
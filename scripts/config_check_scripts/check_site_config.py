@@ -1,89 +1,118 @@
 import logging
 import os
 import argparse
+import hashlib
+import json
+import re
+import time
 import yaml
 
+# The C loader parses large site configs several times faster when libyaml is available
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 WORKING_DIR = os.environ["WORKING_DIR"]
 MODEL_SCHEMA_PATH = f"{WORKING_DIR}/model_schema.yaml"
 MODEL_SCHEMA = yaml.safe_load(open(MODEL_SCHEMA_PATH, 'r'))
 
 
-def validate_bacnet_agent_config(site_config: dict):
+REQUIRED_BACNET_KEYS_AND_TYPES = [
+    ('ip_address', str),
+    ('interval', int),
+    ('read_devices', dict),
+]
+REQUIRED_DEVICE_KEYS_AND_TYPES = [
+    ('model', str),
+    ('servers', list),
+]
+REQUIRED_SERVER_KEYS_AND_TYPES = [
+    ('bacnet_ip', str),
+    ('points', dict),
+]
+
+
+def validate_bacnet_device_structure(dev_id: str, dev_info: dict):
     """
-    Validate the BACnet agent configuration. If the configuration file is not valid, raise an exception
+    Validate the keys and types of a BACnet device and its servers. If they are not valid, raise an exception
     """
-    REQUIRED_KEYS_AND_TYPES = [
-        ('ip_address', str),
-        ('interval', int),
-        ('read_devices', dict),
-    ]
-    REQUIRED_DEVICE_KEYS_AND_TYPES = [
-        ('model', str),
-        ('servers', list),
-    ]
-    REQUIRED_SERVER_KEYS_AND_TYPES = [
-        ('bacnet_ip', str),
-        ('points', dict),
-    ]
+    # Check required device keys
+    for key, value_type in REQUIRED_DEVICE_KEYS_AND_TYPES:
+        if key not in dev_info:
+            raise ValueError(f"[{dev_id}] '{key}' is not defined in the BACnet device configuration")
+        elif not isinstance(dev_info[key], value_type):
+            raise ValueError(f"[{dev_id}] '{key}' should be of type {value_type}")
     
-    agent_config = site_config["volttron_agents"]["bacnet"]
+    # Validate each server in the device
+    for server_idx, server in enumerate(dev_info['servers']):
+        for key, value_type in REQUIRED_SERVER_KEYS_AND_TYPES:
+            if key not in server:
+                raise ValueError(f"[{dev_id}] Server {server_idx}: '{key}' is not defined")
+            elif not isinstance(server[key], value_type):
+                raise ValueError(f"[{dev_id}] Server {server_idx}: '{key}' should be of type {value_type}")
 
-    # Validate top-level BACnet config
-    for key, value_type in REQUIRED_KEYS_AND_TYPES:
+
+def validate_bacnet_device_schema(dev_id: str, dev_info: dict):
+    """
+    Validate the datapoints of a BACnet device against its model schema. If they are not valid, raise an exception
+    """
+    dev_model = dev_info['model']
+    
+    if dev_model not in MODEL_SCHEMA:
+        raise ValueError(f"Model '{dev_model}' for device '{dev_id}' is not in the model schema")
+
+    schema_points = set(MODEL_SCHEMA[dev_model].keys())
+    
+    # Collect all points from all servers
+    all_device_points = set()
+    for server in dev_info['servers']:
+        all_device_points.update(server['points'].keys())
+
+    # Check points validity
+    if not all_device_points.issubset(schema_points):
+        diff_points = all_device_points - schema_points
+        logging.error(f"These points {diff_points} for '{dev_id}' are not in the model schema")
+        raise ValueError(f"These points {diff_points} for '{dev_id}' are not in the model schema")
+    elif not schema_points.issubset(all_device_points):
+        diff_points = schema_points - all_device_points
+        logging.warning(f"These points {diff_points} for '{dev_id}' are not defined in the device config")
+    else:
+        logging.info(f"Verified device '{dev_id}' config successfully")
+
+
+def validate_bacnet_agent_keys(agent_config: dict):
+    """
+    Validate the top-level keys of the BACnet agent configuration. If they are not valid, raise an exception
+    """
+    for key, value_type in REQUIRED_BACNET_KEYS_AND_TYPES:
         if key not in agent_config:
             raise ValueError(f"'{key}' is not defined in the BACnet agent configuration")
         elif not isinstance(agent_config[key], value_type):
             raise ValueError(f"'{key}' should be of type {value_type} in the BACnet agent configuration")
+
+
+def validate_bacnet_agent_config(site_config: dict):
+    """
+    Validate the BACnet agent configuration. If the configuration file is not valid, raise an exception
+    """
+    agent_config = site_config["volttron_agents"]["bacnet"]
+
+    # Validate top-level BACnet config
+    validate_bacnet_agent_keys(agent_config)
         
     # Validate the devices configuration
     bacnet_read_devices = agent_config["read_devices"]
     for dev_id, dev_info in bacnet_read_devices.items():
-        # Check required device keys
-        for key, value_type in REQUIRED_DEVICE_KEYS_AND_TYPES:
-            if key not in dev_info:
-                raise ValueError(f"[{dev_id}] '{key}' is not defined in the BACnet device configuration")
-            elif not isinstance(dev_info[key], value_type):
-                raise ValueError(f"[{dev_id}] '{key}' should be of type {value_type}")
-        
-        # Validate each server in the device
-        for server_idx, server in enumerate(dev_info['servers']):
-            for key, value_type in REQUIRED_SERVER_KEYS_AND_TYPES:
-                if key not in server:
-                    raise ValueError(f"[{dev_id}] Server {server_idx}: '{key}' is not defined")
-                elif not isinstance(server[key], value_type):
-                    raise ValueError(f"[{dev_id}] Server {server_idx}: '{key}' should be of type {value_type}")
+        validate_bacnet_device_structure(dev_id, dev_info)
             
     # Validate the BACnet device datapoint schema
     for dev_id, dev_info in bacnet_read_devices.items():
-        dev_model = dev_info['model']
-        
-        if dev_model not in MODEL_SCHEMA:
-            raise ValueError(f"Model '{dev_model}' for device '{dev_id}' is not in the model schema")
+        validate_bacnet_device_schema(dev_id, dev_info)
 
-        schema_points = set(MODEL_SCHEMA[dev_model].keys())
-        
-        # Collect all points from all servers
-        all_device_points = set()
-        for server in dev_info['servers']:
-            all_device_points.update(server['points'].keys())
-
-        # Check points validity
-        if not all_device_points.issubset(schema_points):
-            diff_points = all_device_points - schema_points
-            logging.error(f"These points {diff_points} for '{dev_id}' are not in the model schema")
-            raise ValueError(f"These points {diff_points} for '{dev_id}' are not in the model schema")
-        elif not schema_points.issubset(all_device_points):
-            diff_points = schema_points - all_device_points
-            logging.warning(f"These points {diff_points} for '{dev_id}' are not defined in the device config")
-        else:
-            logging.info(f"Verified device '{dev_id}' config successfully")
 
 
-
-def validate_site_config(site_config: dict):
+def validate_site_top_level(site_config: dict):
     """
-    Validate the site configuration
+    Validate the site configuration outside of the BACnet agent
     """
     SITE_METADATA_KEYS_AND_TYPES = [
         ('site_name', str),
@@ -119,6 +148,13 @@ def validate_site_config(site_config: dict):
         if "dash_config" not in site_config:
             raise ValueError("'dash_config' is required when alto-dash service is enabled")
 
+
+def validate_site_config(site_config: dict):
+    """
+    Validate the site configuration
+    """
+    validate_site_top_level(site_config)
+
     # Only validate BACnet config if it exists in volttron_agents
     if site_config.get("volttron_agents", {}).get("bacnet"):
         validate_bacnet_agent_config(site_config)
@@ -129,13 +165,238 @@ def validate_site_config(site_config: dict):
     print("Site config for site id: ", site_config["site_id"], " is valid!!!!!!!!")
 
 
+# Anchors, aliases and merge keys can tie device blocks together, so such configs are parsed as a whole
+YAML_REFERENCE_PATTERN = re.compile(r'[&*](?<![^\s\[{,].)[^\s,\[\]{}]')
+YAML_MERGE_KEY_PATTERN = re.compile(r'<<\s*:')
+DEVICE_SECTION_PATTERN = re.compile(r'(?:read|write)_devices:')
+DEVICE_SECTION_LINE_PATTERN = re.compile(r'( *)(read_devices|write_devices):[ \t]*(\{[ \t]*\})?[ \t]*(#.*)?')
+
+
+def split_device_blocks(text: str):
+    """
+    Split a site config into a skeleton with empty read_devices/write_devices and the raw text of every
+    device under them. Returns (skeleton, {section: [(line_number, block), ...]}), or None when the devices
+    are not plain block mappings and the config has to be parsed as a whole.
+    """
+    if YAML_REFERENCE_PATTERN.search(text) or YAML_MERGE_KEY_PATTERN.search(text):
+        return None
+
+    # Patterns start at a newline rather than using ^, which keeps them fast on very large configs
+    skeleton = []
+    sections = {}
+    position = 0
+    for match in DEVICE_SECTION_PATTERN.finditer(text):
+        # A device that happens to be called read_devices is part of the previous section
+        if match.start() < position:
+            continue
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        line_end = text.find('\n', match.end())
+        line_end = len(text) if line_end == -1 else line_end
+        line = DEVICE_SECTION_LINE_PATTERN.fullmatch(text, line_start, line_end)
+        if line is None:
+            if text[line_start:match.start()].strip() == '':
+                return None  # Devices written inline, e.g. read_devices: {...}
+            continue
+        if line.group(3):
+            # An empty inline section, e.g. write_devices: {}, is kept in the skeleton as it is
+            sections.setdefault(line.group(2), [])
+            continue
+
+        # The section ends at the first content line that is not indented deeper than its key
+        section_indent = len(line.group(1))
+        section_end = re.compile(rf'\n {{0,{section_indent}}}[^ \n#]').search(text, line_end)
+        section_end = section_end.start() + 1 if section_end else len(text)
+        section = text[line_end:section_end]
+        skeleton.append(text[position:line_start])
+        skeleton.append(f"{line.group(1)}{line.group(2)}: {{}}\n")
+        position = section_end
+
+        blocks = sections.setdefault(line.group(2), [])
+        first_line = re.search(r'\n( +)[^ \n#]', section)
+        if first_line is None:
+            continue
+        device_indent = len(first_line.group(1))
+        if device_indent > section_indent + 1 and re.search(rf'\n {{{section_indent + 1},{device_indent - 1}}}[^ \n#]', section):
+            return None
+        starts = [m.start() + 1 for m in re.finditer(rf'\n {{{device_indent}}}[^ \n#]', section)]
+        if any(section[start + device_indent] == '-' for start in starts):
+            return None
+
+        line_number = text.count('\n', 0, line_end) + 1
+        previous_start = 0
+        for start, end in zip(starts, starts[1:] + [len(section)]):
+            line_number += section.count('\n', previous_start, start)
+            previous_start = start
+            blocks.append((line_number, section[start:end]))
+
+    skeleton.append(text[position:])
+    return ''.join(skeleton), sections
+
+
+def get_mtime(path: str):
+    """Modification time of a file, or None while it does not exist (e.g. an editor is replacing it)."""
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+
+
+def wait_for_change(paths: list, last_mtimes: dict) -> dict:
+    """
+    Block until one of the files is written and return the new modification times of all of them.
+    Uses inotify when inotify_simple is installed and falls back to polling otherwise.
+    """
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        INotify = None
+
+    def changed_mtimes():
+        mtimes = {path: get_mtime(path) for path in paths}
+        return mtimes if None not in mtimes.values() and mtimes != last_mtimes else None
+
+    if INotify is not None:
+        # Watch the directories since editors often replace the files instead of writing them in place
+        inotify = INotify()
+        for directory in {os.path.dirname(path) for path in paths}:
+            inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+        mtimes = changed_mtimes()
+        while mtimes is None:
+            inotify.read(timeout=1000)
+            mtimes = changed_mtimes()
+        inotify.close()
+    else:
+        mtimes = changed_mtimes()
+        while mtimes is None:
+            time.sleep(0.2)
+            mtimes = changed_mtimes()
+    return mtimes
+
+
+def watch_site_config(site_config_path: str):
+    """
+    Re-validate the site config every time it or the model schema changes. The text of every device
+    block is hashed and only the blocks that changed since the last pass are parsed, so only the read
+    devices that changed are re-validated. Configs using anchors, aliases or flow-style device
+    sections are parsed as a whole, and their changed devices are found from a digest of each device.
+    """
+    block_cache = {}
+    device_digests = {}
+    device_errors = {}
+    last_mtimes = {}
+    revalidate_all = True
+
+    while True:
+        mtimes = wait_for_change([site_config_path, MODEL_SCHEMA_PATH], last_mtimes)
+        schema_changed = bool(last_mtimes) and mtimes[MODEL_SCHEMA_PATH] != last_mtimes[MODEL_SCHEMA_PATH]
+        last_mtimes = mtimes
+        start = time.perf_counter()
+
+        try:
+            if schema_changed:
+                with open(MODEL_SCHEMA_PATH, 'r') as f:
+                    model_schema = yaml.load(f, Loader=YAML_LOADER)
+                MODEL_SCHEMA.clear()
+                MODEL_SCHEMA.update(model_schema)
+                revalidate_all = True
+                print("Model schema changed, re-validating every device")
+            with open(site_config_path, 'r') as f:
+                text = f.read()
+
+            split = split_device_blocks(text)
+            site_config = yaml.load(text if split is None else split[0], Loader=YAML_LOADER)
+            validate_site_top_level(site_config)
+            agent_config = site_config.get("volttron_agents", {}).get("bacnet") or {}
+            if agent_config:
+                validate_bacnet_agent_keys(agent_config)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, yaml.YAMLError) as e:
+            print(f"❌ {e}")
+            continue
+
+        # Parse only the device blocks whose text changed since the last pass
+        parsed_blocks = 0
+        block_errors = []
+        if split is None:
+            # Without device blocks, the changed devices are found by comparing a digest of each parsed device
+            read_devices = agent_config.get("read_devices", {})
+            changed_devices = set()
+            for dev_id, dev_info in read_devices.items():
+                digest = hashlib.sha1(json.dumps(dev_info, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+                if device_digests.get(dev_id) != digest:
+                    device_digests[dev_id] = digest
+                    changed_devices.add(dev_id)
+            for dev_id in device_digests.keys() - read_devices.keys():
+                del device_digests[dev_id]
+            block_cache = {}
+        else:
+            device_digests = {}
+            read_devices = {}
+            changed_devices = set()
+            new_block_cache = {}
+            for line_number, block in split[1].get("read_devices", []):
+                key = hashlib.sha1(block.encode('utf-8')).hexdigest()
+                if key not in block_cache:
+                    parsed_blocks += 1
+                    try:
+                        devices = yaml.load(block, Loader=YAML_LOADER)
+                        if not isinstance(devices, dict):
+                            raise ValueError("a device block should be a mapping")
+                    except (ValueError, yaml.YAMLError) as e:
+                        block_errors.append(f"Device block at line {line_number}: {e}")
+                        continue
+                    block_cache[key] = devices
+                    changed_devices.update(devices)
+                new_block_cache[key] = block_cache[key]
+                read_devices.update(block_cache[key])
+            block_cache = new_block_cache
+
+        if revalidate_all:
+            changed_devices = set(read_devices)
+            revalidate_all = False
+        for dev_id in device_errors.keys() - read_devices.keys():
+            del device_errors[dev_id]
+
+        for dev_id in changed_devices:
+            device_errors.pop(dev_id, None)
+            try:
+                validate_bacnet_device_structure(dev_id, read_devices[dev_id])
+                validate_bacnet_device_schema(dev_id, read_devices[dev_id])
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                device_errors[dev_id] = str(e)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for error in block_errors + [device_errors[dev_id] for dev_id in sorted(device_errors)]:
+            print(f"❌ {error}")
+        n_errors = len(device_errors) + len(block_errors)
+        status = "valid" if not n_errors else f"invalid ({n_errors} devices with errors)"
+        scope = "parsed the whole config" if split is None else f"parsed {parsed_blocks} changed device blocks"
+        print(f"Site config is {status}: {scope}, re-validated {len(changed_devices)}/{len(read_devices)} devices in {elapsed_ms:.0f} ms")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("site_id", help="The id of the site to install agents for")
+    parser.add_argument("--watch", action="store_true", help="Re-validate the changed devices every time the site config is saved")
     args = parser.parse_args()
 
     site_config_path = f"{WORKING_DIR}/site_configs/{args.site_id}.yaml"
 
+    if args.watch:
+        logging.basicConfig(level=logging.WARNING)
+        print(f"Watching {site_config_path} for changes. Press Ctrl+C to stop.")
+        try:
+            watch_site_config(site_config_path)
+        except KeyboardInterrupt:
+            pass
+        raise SystemExit(0)
+
+    # A fresh compiled artifact means this exact config already passed validation
+    from compile_site_config import read_fresh_artifact
+    artifact = read_fresh_artifact(args.site_id)
+    if artifact and artifact['validated']:
+        print("Site config for site id: ", args.site_id, " is valid!!!!!!!! (compiled)")
+        raise SystemExit(0)
+
     # Load the site config
     site_config = yaml.safe_load(open(site_config_path, 'r'))
     assert "site_id" in site_config, "'site_id' is not defined in the site config"
@@ -0,0 +1,182 @@
+"""
+Site Config Compiler
+
+Validates a site config once and writes a normalized, indexed JSON artifact next to it at
+$WORKING_DIR/site_configs/.compiled/<site_id>.json. The artifact is stamped with the hash of
+the YAML source and of model_schema.yaml, so consumers can load it instead of re-parsing the
+YAML and fall back to compiling again when either file changed.
+
+The artifact contains:
+    site_config      the parsed site config
+    enabled_services the enabled services of deployment_config
+    validated        whether the config passed check_site_config.py (and the error if not)
+    index.devices    {device_id: {kind, model, schema_points, servers}}
+    index.servers    {bacnet_ip: [device_id, ...]} of the read and write devices
+    index.points     {device_id: {datapoint: [[point_address, bacnet_ip], ...]}}, so a datapoint
+                     configured on several servers keeps every address
+
+Scripts that rewrite the site config YAML refresh the artifact from the config they already
+hold with write_compiled_site_config(), so the next consumer does not parse the YAML again.
+
+Usage:
+    python compile_site_config.py <site_id> [--strict]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import yaml
+
+from check_site_config import MODEL_SCHEMA, MODEL_SCHEMA_PATH, YAML_LOADER, validate_site_config
+
+ARTIFACT_VERSION = 3
+WORKING_DIR = os.environ["WORKING_DIR"]
+COMPILED_DIR = f"{WORKING_DIR}/site_configs/.compiled"
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def site_config_path(site_id: str) -> str:
+    return f"{WORKING_DIR}/site_configs/{site_id}.yaml"
+
+
+def artifact_path(site_id: str) -> str:
+    return f"{COMPILED_DIR}/{site_id}.json"
+
+
+def build_index(site_config: dict) -> dict:
+    """
+    Build the device, server and point index of the BACnet agent configuration. Devices, servers and
+    points that are not well formed are skipped, the validation result of the artifact reports them.
+    """
+    index = {'devices': {}, 'servers': {}, 'points': {}}
+    bacnet_agent_config = (site_config.get('volttron_agents') or {}).get('bacnet') or {}
+
+    for kind, devices_key in [('read', 'read_devices'), ('write', 'write_devices')]:
+        devices = bacnet_agent_config.get(devices_key)
+        if not isinstance(devices, dict):
+            continue
+        for dev_id, dev_info in devices.items():
+            if not isinstance(dev_info, dict):
+                continue
+            model = dev_info.get('model')
+            schema_points = MODEL_SCHEMA.get(model) if isinstance(model, str) else None
+            device = index['devices'].setdefault(dev_id, {
+                'kind': [],
+                'model': model,
+                'schema_points': sorted(schema_points) if isinstance(schema_points, dict) else [],
+                'servers': [],
+            })
+            device['kind'].append(kind)
+            points = index['points'].setdefault(dev_id, {})
+
+            servers = dev_info.get('servers')
+            for server in servers if isinstance(servers, list) else []:
+                bacnet_ip = server.get('bacnet_ip') if isinstance(server, dict) else None
+                if not bacnet_ip:
+                    continue
+                if bacnet_ip not in device['servers']:
+                    device['servers'].append(bacnet_ip)
+                server_devices = index['servers'].setdefault(bacnet_ip, [])
+                if dev_id not in server_devices:
+                    server_devices.append(dev_id)
+                server_points = server.get('points')
+                for p_name, p_address in (server_points.items() if isinstance(server_points, dict) else []):
+                    points.setdefault(p_name, []).append([p_address, bacnet_ip])
+    return index
+
+
+def write_compiled_site_config(site_id: str, site_config: dict, source_hash: str = None) -> dict:
+    """
+    Validate an already parsed site config and write its artifact, stamped with the hash of its source.
+    """
+    try:
+        validate_site_config(site_config)
+        validation_error = None
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        validation_error = str(e)
+        logging.warning(f"Site config for '{site_id}' is not valid: {validation_error}")
+
+    enabled_services = (site_config.get('deployment_config') or {}).get('enabled_services') or {}
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'site_id': site_id,
+        'source_hash': source_hash or file_hash(site_config_path(site_id)),
+        'schema_hash': file_hash(MODEL_SCHEMA_PATH),
+        'compiled_at': time.time(),
+        'validated': validation_error is None,
+        'validation_error': validation_error,
+        'enabled_services': [service for service, enabled in enabled_services.items() if enabled],
+        'site_config': site_config,
+        'index': build_index(site_config),
+    }
+
+    # Write atomically so concurrent consumers never read a partial artifact
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    tmp_path = f"{artifact_path(site_id)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, separators=(',', ':'), default=str)
+    os.replace(tmp_path, artifact_path(site_id))
+    return artifact
+
+
+def compile_site_config(site_id: str) -> dict:
+    """Parse, validate and compile the site config YAML."""
+    with open(site_config_path(site_id), 'rb') as f:
+        source = f.read()
+    site_config = yaml.load(source, Loader=YAML_LOADER)
+    return write_compiled_site_config(site_id, site_config, hashlib.sha256(source).hexdigest())
+
+
+def read_fresh_artifact(site_id: str):
+    """Return the compiled artifact if it matches the current site config and model schema, else None."""
+    try:
+        with open(artifact_path(site_id), 'r') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        artifact.get('version') != ARTIFACT_VERSION
+        or artifact.get('source_hash') != file_hash(site_config_path(site_id))
+        or artifact.get('schema_hash') != file_hash(MODEL_SCHEMA_PATH)
+    ):
+        return None
+    return artifact
+
+
+def load_compiled_site_config(site_id: str) -> dict:
+    """Return the compiled artifact of the site, compiling it first if it is missing or stale."""
+    return read_fresh_artifact(site_id) or compile_site_config(site_id)
+
+
+def load_site_config(site_id: str) -> dict:
+    """Return the parsed site config through its compiled artifact."""
+    return load_compiled_site_config(site_id)['site_config']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate a site config and compile it into an indexed artifact.')
+    parser.add_argument('site_id', type=str, help='Id of the site configuration to compile.')
+    parser.add_argument('--strict', action='store_true', help='Exit with an error if the site config is not valid.')
+    args = parser.parse_args()
+
+    SITE_ID = args.site_id[:-5] if args.site_id.endswith('.yaml') else args.site_id
+    artifact = read_fresh_artifact(SITE_ID)
+    if artifact:
+        print(f"Compiled site config for '{SITE_ID}' is up to date")
+    else:
+        artifact = compile_site_config(SITE_ID)
+        print(f"✅ Compiled site config for '{SITE_ID}' to {artifact_path(SITE_ID)}")
+
+    if not artifact['validated']:
+        print(f"🔴 Site config for '{SITE_ID}' is not valid: {artifact['validation_error']}")
+        if args.strict:
+            raise SystemExit(1)
@@ -0,0 +1,147 @@
+"""
+BACnet Site Config Generator
+
+Scans BACnet servers and writes a draft 'volttron_agents.bacnet' section for a site config.
+Points are grouped by device and server as they are scanned, and each device is matched to
+the model_schema.yaml model with the largest point-set overlap. Points that are not part of
+the matched model are left out of the draft (check_site_config.py would reject them) and are
+listed in the coverage comment above each device instead.
+
+Usage:
+    python generate_bacnet_config.py <site_id> --ip-address <host_ip/mask> --server-ip <ip> [--server-ip <ip> ...]
+
+Example:
+    python generate_bacnet_config.py cp9 --ip-address 192.168.1.5/24 --server-ip 192.168.1.20 --server-ip 192.168.1.21
+"""
+
+import argparse
+import logging
+import os
+
+import yaml
+
+from check_exported_bacnet_points import iter_scanned_servers
+
+WORKING_DIR = os.environ["WORKING_DIR"]
+MODEL_SCHEMA_PATH = f"{WORKING_DIR}/model_schema.yaml"
+MODEL_SCHEMA = yaml.safe_load(open(MODEL_SCHEMA_PATH, 'r'))
+
+# Precomputed per-model point sets and the inverted point -> models index used for matching
+MODEL_POINT_SETS = {model: frozenset(points or {}) for model, points in MODEL_SCHEMA.items()}
+POINT_MODELS = {}
+for _model, _points in MODEL_POINT_SETS.items():
+    for _point in _points:
+        POINT_MODELS.setdefault(_point, []).append(_model)
+
+
+def match_device_model(device_points: set):
+    """
+    Return (model, overlap) for the model sharing the most points with the device.
+    Ties are broken by the smaller model, i.e. the one the device covers best.
+    """
+    overlaps = {}
+    for p_name in device_points:
+        for model in POINT_MODELS.get(p_name, []):
+            overlaps[model] = overlaps.get(model, 0) + 1
+    if not overlaps:
+        return None, 0
+    model = max(overlaps, key=lambda m: (overlaps[m], -len(MODEL_POINT_SETS[m])))
+    return model, overlaps[model]
+
+
+def group_scanned_points(scanned_servers):
+    """
+    Stream the scanned servers into {device_id: {server_ip: {datapoint: point_address}}}.
+    """
+    devices = {}
+    for server_ip, df in scanned_servers:
+        for dev_id, p_name, p_address in df.itertuples(index=False):
+            server_points = devices.setdefault(dev_id, {}).setdefault(server_ip, {})
+            if p_name in server_points:
+                logging.warning(f" [{dev_id}] Point {p_name} has multiple addresses on {server_ip}, keeping {server_points[p_name]}")
+                continue
+            server_points[p_name] = p_address
+        logging.info(f"Scanned {len(df)} points from {server_ip}")
+    return devices
+
+
+def build_draft_devices(devices: dict):
+    """
+    Match every device to a model and return (read_devices, coverage) for the draft config.
+    """
+    read_devices = {}
+    coverage = {}
+    for dev_id in sorted(devices):
+        device_points = set()
+        for server_points in devices[dev_id].values():
+            device_points.update(server_points)
+
+        model, overlap = match_device_model(device_points)
+        if model is None:
+            logging.warning(f" [{dev_id}] None of its {len(device_points)} points are in the model schema, skipping")
+            continue
+
+        schema_points = MODEL_POINT_SETS[model]
+        read_devices[dev_id] = {
+            'model': model,
+            'servers': [
+                {
+                    'bacnet_ip': server_ip,
+                    'points': {p: server_points[p] for p in sorted(server_points) if p in schema_points},
+                }
+                for server_ip, server_points in devices[dev_id].items()
+            ],
+        }
+        coverage[dev_id] = {
+            'model': model,
+            'matched': overlap,
+            'model_points': len(schema_points),
+            'unmatched': sorted(device_points - schema_points),
+        }
+    return read_devices, coverage
+
+
+def format_draft_config(host_ip_address: str, read_devices: dict, coverage: dict) -> str:
+    """
+    Render the draft BACnet section with a coverage comment above each device.
+    """
+    lines = [
+        'volttron_agents:',
+        '  bacnet:',
+        f'    ip_address: {host_ip_address}',
+        '    interval: 60',
+        '    # Move the devices that are written to into write_devices',
+        '    write_devices: {}',
+        '    read_devices:',
+    ]
+    for dev_id, dev_info in read_devices.items():
+        stats = coverage[dev_id]
+        lines.append(f"      # {dev_id}: {stats['matched']}/{stats['model_points']} '{stats['model']}' points "
+                     f"({stats['matched'] / stats['model_points']:.0%} coverage)")
+        if stats['unmatched']:
+            lines.append(f"      # not in model schema: {', '.join(stats['unmatched'])}")
+        device_yaml = yaml.dump({dev_id: dev_info}, default_flow_style=False, sort_keys=False)
+        lines.extend(f'      {line}' for line in device_yaml.splitlines())
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a draft BACnet agent config from a BACnet scan.')
+    parser.add_argument('site_id', type=str, help='Id of the site the draft config is generated for.')
+    parser.add_argument('--ip-address', required=True, help='IP address (with mask) of this gateway on the BACnet network.')
+    parser.add_argument('--server-ip', action='append', required=True, help='BACnet server IP to scan, can be repeated.')
+    parser.add_argument('--output', help='Output path (default: site_configs/<site_id>.bacnet-draft.yaml).')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    SITE_ID = args.site_id[:-5] if args.site_id.endswith('.yaml') else args.site_id
+    output_path = args.output or f'{WORKING_DIR}/site_configs/{SITE_ID}.bacnet-draft.yaml'
+
+    devices = group_scanned_points(iter_scanned_servers(args.ip_address, args.server_ip))
+    read_devices, coverage = build_draft_devices(devices)
+
+    with open(output_path, 'w') as f:
+        f.write(format_draft_config(args.ip_address, read_devices, coverage))
+
+    total_points = sum(len(server['points']) for dev_info in read_devices.values() for server in dev_info['servers'])
+    print(f"✅ Wrote {len(read_devices)} devices ({total_points} points) to {output_path}")
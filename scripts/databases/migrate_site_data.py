@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Site Data Migration
+
+Exports the historical data of a gateway's TimescaleDB and MongoDB containers into a directory
+and imports it into the containers of another gateway, e.g. when a gateway is replaced or a
+site is moved. This replaces copying the timescaledb_data and mongodb_data volumes.
+
+Export:
+  - the schema (pg_dump --schema-only), split into pre-data and post-data so indexes and
+    constraints are built once after the data is loaded
+  - the hypertable dimensions and the sequence values
+  - every hypertable chunk and every regular table with COPY ... TO STDOUT (FORMAT binary),
+    several chunks in parallel
+  - every MongoDB collection with mongodump, which reads it through bulk cursors
+
+Every stream is gzip-compressed into its own file and recorded in manifest.json together with
+the SHA-256 and size of the uncompressed stream. Exports and imports are resumable per chunk:
+exported files already in the manifest are skipped, and imported ones are recorded in an import
+state file next to the manifest. Files are verified against their checksum before import. A
+chunk or table whose load was started but not recorded as finished is cleared in the target
+before it is loaded again: the chunk's time range is deleted from its hypertable (reloading the
+other chunks of that range) and a regular table is truncated.
+
+Continuous aggregates are left out of the schema, since their views are defined on internal
+TimescaleDB tables. They are re-created from their definitions and refreshed once the data is
+loaded.
+
+Both sides run through docker exec on local containers (infra_timescaledb and infra_mongodb
+by default), so a migration can be rehearsed offline against the compose stack. Stop the
+writers (VOLTTRON agents) before exporting for a consistent copy. Compression and retention
+policies, including the refresh policies of continuous aggregates, are not migrated.
+
+Usage:
+    python migrate_site_data.py export <export_dir> [--workers N] [--compress-level L] [--skip-mongo]
+    python migrate_site_data.py import <export_dir> [--workers N] [--skip-schema] [--skip-mongo]
+    python migrate_site_data.py verify <export_dir>
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_VERSION = 1
+BLOCK_SIZE = 1024 * 1024
+TIMESCALEDB_CONTAINER = 'infra_timescaledb'
+MONGODB_CONTAINER = 'infra_mongodb'
+TIMESCALEDB_DATABASE = os.environ.get('TIMESCALEDB_DATABASE', 'postgres')
+INTERNAL_SCHEMAS = [
+    '_timescaledb_internal', '_timescaledb_catalog', '_timescaledb_config', '_timescaledb_cache',
+    '_timescaledb_functions', '_timescaledb_debug', 'timescaledb_information', 'timescaledb_experimental',
+    'toolkit_experimental',
+]
+
+INTERNAL_SCHEMAS_LIST = ', '.join(f"'{schema}'" for schema in INTERNAL_SCHEMAS)
+
+# Chunk ranges are printed in UTC so they can be compared with timestamp columns too. The materialization
+# hypertables of continuous aggregates are internal, the aggregates are refreshed after the import instead
+CHUNKS_QUERY = f"""
+SET TIME ZONE 'UTC';
+SELECT format('%I.%I', hypertable_schema, hypertable_name),
+       format('%I.%I', chunk_schema, chunk_name),
+       chunk_schema || '.' || chunk_name,
+       coalesce(range_start::text, range_start_integer::text),
+       coalesce(range_end::text, range_end_integer::text)
+FROM timescaledb_information.chunks
+WHERE hypertable_schema NOT IN ({INTERNAL_SCHEMAS_LIST})
+ORDER BY hypertable_schema, hypertable_name, range_start, range_start_integer
+"""
+DIMENSIONS_QUERY = f"""
+SELECT format('%I.%I', hypertable_schema, hypertable_name), column_name, dimension_type,
+       time_interval, integer_interval, num_partitions
+FROM timescaledb_information.dimensions
+WHERE hypertable_schema NOT IN ({INTERNAL_SCHEMAS_LIST})
+ORDER BY hypertable_schema, hypertable_name, dimension_number
+"""
+TABLES_QUERY = f"""
+SELECT format('%I.%I', t.table_schema, t.table_name), t.table_schema || '.' || t.table_name
+FROM information_schema.tables t
+WHERE t.table_type = 'BASE TABLE'
+  AND t.table_schema NOT IN ('pg_catalog', 'information_schema', {INTERNAL_SCHEMAS_LIST})
+  AND NOT EXISTS (
+    SELECT 1 FROM timescaledb_information.hypertables h
+    WHERE h.hypertable_schema = t.table_schema AND h.hypertable_name = t.table_name
+  )
+"""
+# Ordered by materialization hypertable, so aggregates defined on other aggregates come after them
+CONTINUOUS_AGGREGATES_QUERY = """
+SELECT coalesce(json_agg(json_build_object(
+           'view', format('%I.%I', view_schema, view_name),
+           'materialized_only', materialized_only,
+           'definition', view_definition
+       ) ORDER BY substring(materialization_hypertable_name FROM '[0-9]+$')::int), '[]')
+FROM timescaledb_information.continuous_aggregates
+"""
+SEQUENCES_QUERY = f"""
+SELECT format('SELECT setval(%L, %s, true);', format('%I.%I', schemaname, sequencename), last_value)
+FROM pg_sequences
+WHERE last_value IS NOT NULL
+  AND schemaname NOT IN ({INTERNAL_SCHEMAS_LIST})
+"""
+MONGO_COLLECTIONS_JS = """
+var namespaces = [];
+db.adminCommand({listDatabases: 1}).databases.forEach(function(d) {
+  if (['admin', 'config', 'local'].indexOf(d.name) < 0) {
+    db.getSiblingDB(d.name).getCollectionNames().forEach(function(c) { namespaces.push(d.name + '.' + c); });
+  }
+});
+print(JSON.stringify(namespaces));
+"""
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def sql_identifier(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def psql_command(container: str, database: str, *psql_args, interactive=False) -> list:
+    return [
+        'docker', 'exec', *(['-i'] if interactive else []), container,
+        'psql', '-X', '-q', '-U', 'postgres', '-d', database, '-v', 'ON_ERROR_STOP=1', *psql_args,
+    ]
+
+
+def query_rows(container: str, database: str, sql: str) -> list:
+    """Run a query in the TimescaleDB container and return its rows as lists of strings (NULL is '')."""
+    result = subprocess.run(psql_command(container, database, '-At', '-F', '\t', '-c', sql), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Query failed in {container}: {result.stderr.strip()}")
+    return [line.split('\t') for line in result.stdout.splitlines()]
+
+
+def mongo_shell_output(container: str, script: str) -> str:
+    """Run a script with the MongoDB shell of the container (mongosh, or mongo on older images)."""
+    for shell in ['mongosh', 'mongo']:
+        try:
+            result = subprocess.run(['docker', 'exec', container, shell, '--quiet', '--eval', script], capture_output=True, text=True)
+        except OSError as e:
+            raise RuntimeError(f"Failed to run docker: {e}")
+        if result.returncode == 0:
+            return result.stdout
+    raise RuntimeError(f"MongoDB shell failed in {container}: {result.stderr.strip()}")
+
+
+def stream_to_file(command: list, path: str, compress_level: int) -> dict:
+    """
+    Run a command and write its stdout gzip-compressed to path.
+    Returns the SHA-256 and size of the uncompressed stream.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{path}.partial"
+    with tempfile.TemporaryFile() as stderr:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr) as process, \
+                gzip.open(tmp_path, 'wb', compresslevel=compress_level) as f:
+            for block in iter(lambda: process.stdout.read(BLOCK_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+                f.write(block)
+        if process.returncode != 0:
+            os.remove(tmp_path)
+            stderr.seek(0)
+            raise RuntimeError(f"{' '.join(command[:4])} failed: {stderr.read().decode(errors='replace').strip()}")
+    # Only complete files get their final name, so an interrupted export leaves no valid-looking file
+    os.replace(tmp_path, path)
+    return {'sha256': digest.hexdigest(), 'bytes': size}
+
+
+def verify_file(path: str, entry: dict):
+    """Check that the uncompressed contents of an exported file match its manifest entry."""
+    digest = hashlib.sha256()
+    size = 0
+    with gzip.open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+            size += len(block)
+    if digest.hexdigest() != entry['sha256'] or size != entry['bytes']:
+        raise ValueError(f"Checksum mismatch for {path}")
+
+
+def stream_from_file(command: list, path: str):
+    """Decompress a file into the stdin of a command."""
+    with tempfile.TemporaryFile() as stderr:
+        with gzip.open(path, 'rb') as f, \
+                subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr, bufsize=0) as process:
+            try:
+                shutil.copyfileobj(f, process.stdin, BLOCK_SIZE)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"Loading {path} failed: {stderr.read().decode(errors='replace').strip()}")
+
+
+class StateFile:
+    """
+    A JSON file updated by several worker threads; every update is written atomically so an
+    interrupted run can be resumed from it.
+    """
+
+    def __init__(self, path: str, default: dict):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = default
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def set(self, section: str, key: str, value):
+        with self.lock:
+            self.data.setdefault(section, {})[key] = value
+            self.save()
+
+
+def run_parallel(function, items: list, workers: int) -> list:
+    """Run function on every item with a thread pool, print progress and return the failed items."""
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(item, executor.submit(function, item)) for item in items]
+        for i, (item, future) in enumerate(futures, start=1):
+            try:
+                future.result()
+                print(f"  [{i}/{len(items)}] ✅ {item}")
+            except Exception as e:
+                failed.append(item)
+                print(f"  [{i}/{len(items)}] ❌ {item}: {e}")
+    return failed
+
+
+def export_site_data(args) -> int:
+    os.makedirs(os.path.join(args.export_dir, 'timescaledb'), exist_ok=True)
+    os.makedirs(os.path.join(args.export_dir, 'mongodb'), exist_ok=True)
+    manifest = StateFile(os.path.join(args.export_dir, 'manifest.json'), {'version': MANIFEST_VERSION, 'units': {}})
+    if manifest.data.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.data.get('version')} in {args.export_dir}")
+    start = time.perf_counter()
+
+    # The schema and metadata are small and always exported again
+    print(f"Exporting schema of '{args.database}' from {args.pg_container}")
+    continuous_aggregates = json.loads(query_rows(args.pg_container, args.database, CONTINUOUS_AGGREGATES_QUERY)[0][0])
+    pg_dump = [
+        'docker', 'exec', args.pg_container, 'pg_dump', '-U', 'postgres', '-d', args.database, '--schema-only',
+        '--no-owner', '--no-privileges', '--exclude-extension=timescaledb*',
+        *[f'--exclude-schema={schema}' for schema in INTERNAL_SCHEMAS],
+        *[f"--exclude-table={aggregate['view']}" for aggregate in continuous_aggregates],
+    ]
+    for section in ['pre-data', 'post-data']:
+        file_name = f'timescaledb/schema.{section}.sql.gz'
+        entry = stream_to_file([*pg_dump, f'--section={section}'], os.path.join(args.export_dir, file_name), args.compress_level)
+        manifest.set('schema', section, dict(entry, file=file_name))
+
+    hypertables = {}
+    for hypertable, column, dimension_type, time_interval, integer_interval, num_partitions in query_rows(
+            args.pg_container, args.database, DIMENSIONS_QUERY):
+        hypertables.setdefault(hypertable, []).append({
+            'column': column,
+            'type': dimension_type,
+            'time_interval': time_interval or None,
+            'integer_interval': int(integer_interval) if integer_interval else None,
+            'num_partitions': int(num_partitions) if num_partitions else None,
+        })
+    with manifest.lock:
+        manifest.data['database'] = args.database
+        manifest.data['hypertables'] = hypertables
+        manifest.data['continuous_aggregates'] = continuous_aggregates
+        manifest.data['sequences'] = [row[0] for row in query_rows(args.pg_container, args.database, SEQUENCES_QUERY)]
+        manifest.save()
+
+    # Units are loaded into their target table: chunks into their hypertable, regular tables into themselves
+    units = {}
+    for hypertable, chunk, chunk_file_name, range_start, range_end in query_rows(args.pg_container, args.database, CHUNKS_QUERY):
+        units[f'timescaledb/{chunk_file_name}'] = {
+            'kind': 'chunk', 'source': chunk, 'target': hypertable, 'range': [range_start, range_end],
+        }
+    for table, table_file_name in query_rows(args.pg_container, args.database, TABLES_QUERY):
+        units[f'timescaledb/{table_file_name}'] = {'kind': 'table', 'source': table, 'target': table}
+    if not args.skip_mongo:
+        # The shell may print warnings first, the namespaces are the last line
+        for namespace in json.loads(mongo_shell_output(args.mongo_container, MONGO_COLLECTIONS_JS).strip().splitlines()[-1]):
+            units[f'mongodb/{namespace}'] = {'kind': 'collection', 'source': namespace, 'target': namespace}
+
+    def export_unit(name: str):
+        unit = units[name]
+        file_name = f"{name}.{'archive' if unit['kind'] == 'collection' else 'copy'}.gz"
+        if unit['kind'] == 'collection':
+            database, collection = unit['source'].split('.', 1)
+            command = ['docker', 'exec', args.mongo_container, 'mongodump', '--quiet', '--archive',
+                       f'--db={database}', f'--collection={collection}']
+        else:
+            command = psql_command(args.pg_container, args.database, '-c',
+                                   f"COPY (SELECT * FROM {unit['source']}) TO STDOUT (FORMAT binary)")
+        entry = stream_to_file(command, os.path.join(args.export_dir, file_name), args.compress_level)
+        manifest.set('units', name, dict(unit, file=file_name, **entry))
+
+    exported = manifest.data['units']
+    pending = [
+        name for name in units
+        if name not in exported or not os.path.exists(os.path.join(args.export_dir, exported[name]['file']))
+    ]
+    print(f"Exporting {len(pending)} of {len(units)} chunks, tables and collections ({len(units) - len(pending)} already exported)")
+    failed = run_parallel(export_unit, pending, args.workers)
+
+    total_bytes = sum(entry['bytes'] for name, entry in manifest.data['units'].items() if name in units)
+    print(f"Exported {total_bytes / 1024 ** 2:.1f} MiB uncompressed in {time.perf_counter() - start:.1f}s to {args.export_dir}")
+    if failed:
+        print(f"❌ {len(failed)} failed, run the export again to resume")
+        return 1
+    return 0
+
+
+def create_hypertable_sql(hypertable: str, dimensions: list) -> str:
+    """SQL that turns a restored table into a hypertable with the exported dimensions."""
+    statements = []
+    for i, dimension in enumerate(dimensions):
+        if dimension['num_partitions']:
+            partitioning = f"number_partitions => {dimension['num_partitions']}"
+        elif dimension['time_interval']:
+            partitioning = f"chunk_time_interval => INTERVAL {sql_literal(dimension['time_interval'])}"
+        else:
+            partitioning = f"chunk_time_interval => {dimension['integer_interval']}"
+        if i == 0:
+            # Indexes are restored from the post-data section, so none are created here
+            statements.append(
+                f"SELECT create_hypertable({sql_literal(hypertable)}, {sql_literal(dimension['column'])}, {partitioning}, "
+                f"create_default_indexes => FALSE, if_not_exists => TRUE);"
+            )
+        else:
+            statements.append(
+                f"SELECT add_dimension({sql_literal(hypertable)}, {sql_literal(dimension['column'])}, {partitioning}, if_not_exists => TRUE);"
+            )
+    return '\n'.join(statements)
+
+
+def clear_started_units(args, manifest: dict, started: list, imported: dict) -> list:
+    """
+    Remove the rows of chunks and tables whose load was started but not recorded as finished, so loading
+    them again does not duplicate rows. A chunk is cleared by deleting its time range from the hypertable,
+    which also removes the other chunks of that range, so those are returned to be loaded again as well.
+    """
+    reload = []
+    cleared_ranges = set()
+    for name in started:
+        entry = manifest['units'][name]
+        if entry['kind'] == 'table':
+            print(f"Truncating {entry['target']} before loading it again")
+            query_rows(args.pg_container, args.database, f"TRUNCATE {entry['target']};")
+            continue
+        if 'range' not in entry:
+            raise ValueError(f"{name} was partly imported and its export has no chunk range, export it again")
+        if (entry['target'], *entry['range']) in cleared_ranges:
+            continue
+        cleared_ranges.add((entry['target'], *entry['range']))
+
+        column = sql_identifier(manifest['hypertables'][entry['target']][0]['column'])
+        range_start, range_end = entry['range']
+        print(f"Deleting [{range_start}, {range_end}) from {entry['target']} before loading {name} again")
+        query_rows(
+            args.pg_container, args.database,
+            f"DELETE FROM {entry['target']} WHERE {column} >= {sql_literal(range_start)} AND {column} < {sql_literal(range_end)};",
+        )
+        for other_name, other_entry in manifest['units'].items():
+            if other_entry['kind'] == 'chunk' and other_entry['target'] == entry['target'] and other_entry.get('range') == entry['range']:
+                imported.pop(other_name, None)
+                reload.append(other_name)
+    return reload
+
+
+def import_site_data(args) -> int:
+    manifest_path = os.path.join(args.export_dir, 'manifest.json')
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.get('version')} in {args.export_dir}")
+    state = StateFile(os.path.join(args.export_dir, f'import_state.{args.pg_container}.{args.database}.json'), {})
+    imported = state.data.setdefault('units', {})
+    start = time.perf_counter()
+
+    def load_sql(name: str, entry: dict):
+        path = os.path.join(args.export_dir, entry['file'])
+        verify_file(path, entry)
+        stream_from_file(psql_command(args.pg_container, args.database, '-f', '-', interactive=True), path)
+        state.set('units', name, entry['sha256'])
+
+    if not args.skip_schema and imported.get('schema/pre-data') != manifest['schema']['pre-data']['sha256']:
+        print(f"Restoring schema into '{args.database}' of {args.pg_container}")
+        load_sql('schema/pre-data', manifest['schema']['pre-data'])
+
+    hypertables_sql = '\n'.join(create_hypertable_sql(hypertable, dimensions) for hypertable, dimensions in manifest['hypertables'].items())
+    if hypertables_sql:
+        query_rows(args.pg_container, args.database, hypertables_sql)
+
+    def import_unit(name: str):
+        entry = manifest['units'][name]
+        path = os.path.join(args.export_dir, entry['file'])
+        verify_file(path, entry)
+        if entry['kind'] == 'collection':
+            # --drop makes a collection import repeatable if it was interrupted. Collections are already restored
+            # --workers at a time, so each restore keeps mongorestore's default number of insertion workers
+            command = ['docker', 'exec', '-i', args.mongo_container, 'mongorestore', '--quiet', '--archive', '--drop',
+                       f"--nsInclude={entry['target']}"]
+        else:
+            command = psql_command(args.pg_container, args.database, '-c',
+                                   f"COPY {entry['target']} FROM STDIN (FORMAT binary)", interactive=True)
+            state.set('started', name, entry['sha256'])
+        stream_from_file(command, path)
+        state.set('units', name, entry['sha256'])
+
+    units = [
+        name for name, entry in manifest['units'].items()
+        if not (args.skip_mongo and entry['kind'] == 'collection')
+    ]
+    started = [
+        name for name in units
+        if name in state.data.get('started', {}) and imported.get(name) != manifest['units'][name]['sha256']
+    ]
+    reload = clear_started_units(args, manifest, started, imported)
+    if reload:
+        with state.lock:
+            state.save()
+    pending = [name for name in units if imported.get(name) != manifest['units'][name]['sha256']]
+    print(f"Importing {len(pending)} of {len(units)} chunks, tables and collections ({len(units) - len(pending)} already imported)")
+    failed = run_parallel(import_unit, pending, args.workers)
+    if failed:
+        print(f"❌ {len(failed)} failed, run the import again to resume")
+        return 1
+
+    if not args.skip_schema and imported.get('schema/post-data') != manifest['schema']['post-data']['sha256']:
+        print("Restoring indexes and constraints")
+        load_sql('schema/post-data', manifest['schema']['post-data'])
+    if manifest['sequences']:
+        query_rows(args.pg_container, args.database, '\n'.join(manifest['sequences']))
+
+    # Continuous aggregates are created and refreshed one statement at a time, neither can run in a transaction
+    for aggregate in manifest.get('continuous_aggregates', []):
+        if args.skip_schema or imported.get(f"continuous_aggregate/{aggregate['view']}"):
+            continue
+        print(f"Re-creating continuous aggregate {aggregate['view']}")
+        materialized_only = 'true' if aggregate['materialized_only'] else 'false'
+        query_rows(
+            args.pg_container, args.database,
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {aggregate['view']} "
+            f"WITH (timescaledb.continuous, timescaledb.materialized_only = {materialized_only}) AS "
+            f"{aggregate['definition'].strip().rstrip(';')} WITH NO DATA",
+        )
+        query_rows(args.pg_container, args.database, f"CALL refresh_continuous_aggregate({sql_literal(aggregate['view'])}, NULL, NULL)")
+        state.set('units', f"continuous_aggregate/{aggregate['view']}", True)
+
+    print(f"✅ Imported {args.export_dir} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def verify_export(args) -> int:
+    with open(os.path.join(args.export_dir, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    entries = {f'schema/{section}': entry for section, entry in manifest.get('schema', {}).items()}
+    entries.update(manifest['units'])
+
+    def verify_entry(name: str):
+        verify_file(os.path.join(args.export_dir, entries[name]['file']), entries[name])
+
+    print(f"Verifying {len(entries)} exported files")
+    failed = run_parallel(verify_entry, list(entries), args.workers)
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export and import the TimescaleDB and MongoDB data of a site.')
+    parser.add_argument('command', choices=['export', 'import', 'verify'], help='Action to perform.')
+    parser.add_argument('export_dir', help='Directory holding the exported data and manifest.')
+    parser.add_argument('--workers', type=int, default=4, help='Chunks and collections transferred at once.')
+    parser.add_argument('--compress-level', type=int, default=3, help='gzip level of the exported files (1-9).')
+    parser.add_argument('--pg-container', default=TIMESCALEDB_CONTAINER, help='TimescaleDB container to export from or import into.')
+    parser.add_argument('--mongo-container', default=MONGODB_CONTAINER, help='MongoDB container to export from or import into.')
+    parser.add_argument('--database', default=TIMESCALEDB_DATABASE, help='TimescaleDB database.')
+    parser.add_argument('--skip-schema', action='store_true', help='Import into tables that already exist in the target.')
+    parser.add_argument('--skip-mongo', action='store_true', help='Leave out the MongoDB collections.')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        return export_site_data(args)
+    if args.command == 'import':
+        return import_site_data(args)
+    return verify_export(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -4,10 +4,11 @@
 # It handles installation, setting up necessary dependencies, configuring services,
 # and installing required applications.
 #
-# Usage: ./install.sh --token <token>
+# Usage: ./install.sh --token <token> [--modules-only]
 #
 # Arguments:
 #   --token: The token to use for the installation.
+#   --modules-only: Only pull and recreate the modules whose image or env changed.
 #
 # Note: Before running this script, make sure to run init-submodules.sh first
 # to initialize and update all required git submodules.
@@ -16,6 +17,7 @@
 site_id=""
 token=""
 with_azure=true
+modules_only=false
 
 
 # Terminal colors and styles
@@ -41,6 +43,9 @@ while [[ $# -gt 0 ]]; do
         token="$2"
         shift
         ;;
+    --modules-only)
+        modules_only=true
+        ;;
     *)
         echo "Unknown option: $1"
         ;;
@@ -116,6 +121,14 @@ else
 fi
 
 
+# Roll out only the changed modules instead of re-running the whole core install
+if $modules_only; then
+    echo "Reconciling modules..."
+    sudo -E python3 $WORKING_DIR/scripts/installation_scripts/reconcile_modules.py
+    exit $?
+fi
+
+
 # Installation scripts
 INSTALL_SCRIPTS=(
     "sudo bash $WORKING_DIR/scripts/installation_scripts/01_install-docker.sh"
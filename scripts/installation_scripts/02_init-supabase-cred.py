@@ -125,14 +125,15 @@ def update_supabase_agent_config(site_id, anon_key):
         if 'volttron_agents' not in site_config:
             site_config['volttron_agents'] = {}
         
-        # Check if supabase section exists, if not create it
-        if 'supabase' not in site_config['volttron_agents']:
-            site_config['volttron_agents']['supabase'] = {
-                'url': "http://0.0.0.0:8000/",
-                'key': "YOUR_SUPABASE_ANON_KEY",
-                'flush_interval': 2,  # seconds
-                'check_interval': 10
-            }
+        # Fill in any missing supabase settings, keeping values tuned by supabase_flush_benchmark.py
+        supabase_config = site_config['volttron_agents'].setdefault('supabase', {})
+        for key, value in {
+            'url': "http://0.0.0.0:8000/",
+            'key': "YOUR_SUPABASE_ANON_KEY",
+            'flush_interval': 2,  # seconds
+            'check_interval': 10
+        }.items():
+            supabase_config.setdefault(key, value)
         
         # Update the ANON key
         site_config['volttron_agents']['supabase']['key'] = anon_key
@@ -13,6 +13,7 @@ import hmac
 import hashlib
 from dotenv import load_dotenv
 import argparse
+import sys
 import yaml
 
 load_dotenv()
@@ -23,6 +24,9 @@ id_scope = os.getenv("PROVISIONING_IDSCOPE")
 registration_id = os.getenv("DEVICE_ID")
 WORKING_DIR = os.environ["WORKING_DIR"]
 
+sys.path.append(os.path.join(WORKING_DIR, "scripts", "config_check_scripts"))
+from compile_site_config import write_compiled_site_config  # noqa: E402
+
 
 def get_symmetric_key():
     group_primary_key = os.getenv("PROVISIONING_GROUP_PRIMARY_KEY")
@@ -71,6 +75,8 @@ def main():
         site_config["volttron_agents"]["iothub"]["connection_string"] = device_connection_string
         with open(SITE_CONFIG_PATH, 'w') as f:
             yaml.dump(site_config, f)
+        # Refresh the compiled artifact from the config in hand instead of re-parsing the YAML later
+        write_compiled_site_config(SITE_ID, site_config)
     except Exception as e:
         print(f"Error updating site config: {e}")
 
@@ -66,6 +66,9 @@ print('true' if config['deployment_config']['enabled_services'].get('supabase',
 echo -e "\nList of Services"
 echo "$SERVICES_STATUS" | grep -v "^---ENABLED---"
 
+echo -e "\nGenerating tuned nginx proxy profile..."
+python3 $WORKING_DIR/scripts/installation_scripts/generate_nginx_conf.py $site_id --enable
+
 echo -e "\nInstalling Core services..."
 sudo docker compose up -d
 
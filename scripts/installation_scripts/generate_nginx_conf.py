@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Tuned Nginx Proxy Profile Generator
+
+Generates a performance-tuned nginx reverse proxy config for the services enabled in a
+site config. Compared to the stock nginx.conf it adds:
+  - upstream blocks with keepalive pools and HTTP/1.1 connection reuse to every backend
+  - gzip compression of text responses
+  - long-lived caching of the React frontend's hashed /assets/ files
+  - a 1 second micro-cache for read-only /api/ GET requests, keyed on the Authorization
+    header and the whole Cookie header so responses are never shared between users
+  - websocket upgrades that fall back to keepalive connections for plain requests
+
+Only locations of enabled services are emitted. start.sh regenerates the profile when it is
+in use, so enabling a service such as metrics-exporter takes effect on the next start. nginx resolves the upstream hosts when it
+starts, so the enabled services must be running on the azure-iot-edge network before the
+proxy is (re)started with this profile. Brotli is not emitted since nginx:alpine ships without it.
+
+Usage:
+    python generate_nginx_conf.py <site_id> [--output <path>] [--enable]
+
+Arguments:
+    site_id     Site ID of the site configuration to use
+    --output    Output path (default: $WORKING_DIR/nginx.tuned.conf)
+    --enable    Set NGINX_CONF in $WORKING_DIR/.env so docker compose mounts the tuned profile
+
+Example:
+    python generate_nginx_conf.py cp9 --enable
+"""
+
+import argparse
+import os
+import sys
+
+WORKING_DIR = os.environ.get('WORKING_DIR', os.getcwd())
+
+sys.path.append(os.path.join(WORKING_DIR, 'scripts', 'config_check_scripts'))
+from compile_site_config import load_site_config  # noqa: E402
+
+# (location, upstream, host:port, upstream path, websocket, services that enable it)
+# CPMS locations are also enabled by 'supabase', matching how start.sh starts the CPMS stack.
+# /metrics is an exact match so paths like /metrics-foo are not proxied to the exporter
+SERVICE_LOCATIONS = [
+    ('/', 'alto_cero_interface', 'alto-cero-interface:80', '', False, ['alto-cero-interface', 'supabase']),
+    ('/api/', 'alto_cero_automation_backend', 'alto-cero-automation-backend:8001', '', False, ['alto-cero-automation-backend', 'supabase']),
+    ('/realtime/', 'supabase_kong', 'supabase-kong:8000', '/', True, ['supabase']),
+    ('/dashboard/', 'alto_dash', 'alto-dash:8801', '/dashboard/', True, ['alto-dash']),
+    ('= /metrics', 'alto_metrics_exporter', 'host.docker.internal:9108', '/metrics', False, ['metrics-exporter']),
+]
+
+PROXY_HEADERS = """        proxy_http_version 1.1;
+        proxy_set_header Connection $connection_upgrade;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+"""
+
+
+def get_enabled_locations(site_config: dict) -> list:
+    """Return the service locations enabled in the site config."""
+    enabled_services = {
+        service for service, enabled in site_config['deployment_config']['enabled_services'].items() if enabled
+    }
+    return [location for location in SERVICE_LOCATIONS if enabled_services & set(location[5])]
+
+
+def render_location(path, upstream, upstream_path, websocket) -> str:
+    """Render the location block(s) for one proxied service."""
+    proxy_pass = f"http://{upstream}{upstream_path}"
+    blocks = []
+
+    if path == '/':
+        # Vite emits content-hashed file names under /assets/, so they never change
+        blocks.append(f"""    location /assets/ {{
+        proxy_pass {proxy_pass};
+{PROXY_HEADERS}        proxy_cache static_cache;
+        proxy_cache_valid 200 30d;
+        proxy_ignore_headers Cache-Control Expires Set-Cookie;
+        proxy_hide_header Cache-Control;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        add_header X-Cache-Status $upstream_cache_status;
+    }}
+""")
+
+    extra = ""
+    if path == '/api/':
+        # Any cookie may carry the session (JWTs, renamed session cookies), so the whole Cookie header is in the key
+        extra = """        proxy_cache api_cache;
+        proxy_cache_methods GET HEAD;
+        proxy_cache_key "$scheme$request_method$host$request_uri$http_authorization$http_cookie";
+        proxy_cache_valid 200 1s;
+        proxy_cache_lock on;
+        proxy_cache_use_stale updating;
+        add_header X-Cache-Status $upstream_cache_status;
+"""
+    elif websocket:
+        extra = """        proxy_buffering off;
+        proxy_read_timeout 1h;
+"""
+
+    blocks.append(f"""    location {path} {{
+        proxy_pass {proxy_pass};
+{PROXY_HEADERS}{extra}    }}
+""")
+    return '\n'.join(blocks)
+
+
+def render_nginx_conf(locations: list) -> str:
+    """Render the full tuned nginx server config."""
+    upstreams = '\n'.join(
+        f"""upstream {upstream} {{
+    server {server};
+    keepalive 32;
+    keepalive_requests 1000;
+    keepalive_timeout 60s;
+}}
+""" for _, upstream, server, _, _, _ in locations
+    )
+    location_blocks = '\n'.join(
+        render_location(path, upstream, upstream_path, websocket)
+        for path, upstream, _, upstream_path, websocket, _ in locations
+    )
+    return f"""# Generated by scripts/installation_scripts/generate_nginx_conf.py - do not edit by hand
+
+{upstreams}
+# Keep upstream connections alive unless the client asks for a websocket upgrade
+map $http_upgrade $connection_upgrade {{
+    default upgrade;
+    ''      '';
+}}
+
+proxy_cache_path /var/cache/nginx/static levels=1:2 keys_zone=static_cache:10m max_size=512m inactive=30d use_temp_path=off;
+proxy_cache_path /var/cache/nginx/api levels=1:2 keys_zone=api_cache:10m max_size=64m inactive=1m use_temp_path=off;
+
+server {{
+    listen 80;
+    server_name _;  # This will match any hostname
+
+    keepalive_timeout 65s;
+    keepalive_requests 1000;
+
+    gzip on;
+    gzip_comp_level 5;
+    gzip_min_length 1024;
+    gzip_proxied any;
+    gzip_vary on;
+    gzip_types text/plain text/css text/javascript application/javascript application/json application/xml image/svg+xml;
+
+    proxy_buffering on;
+    proxy_buffers 32 16k;
+    proxy_buffer_size 16k;
+
+{location_blocks}}}
+"""
+
+
+def enable_nginx_profile(output_path: str):
+    """Set NGINX_CONF in the main .env file so docker compose mounts the generated profile."""
+    env_path = os.path.join(WORKING_DIR, '.env')
+    lines = []
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            lines = [line if line.endswith('\n') else f'{line}\n' for line in f.readlines()]
+
+    for i, line in enumerate(lines):
+        if line.strip().startswith('NGINX_CONF='):
+            lines[i] = f'NGINX_CONF={output_path}\n'
+            break
+    else:
+        lines.append(f'NGINX_CONF={output_path}\n')
+
+    with open(env_path, 'w') as f:
+        f.writelines(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a tuned nginx proxy profile from the site config.')
+    parser.add_argument('site_id', help='Site ID of the site configuration to use')
+    parser.add_argument('--output', default=os.path.join(WORKING_DIR, 'nginx.tuned.conf'), help='Output path')
+    parser.add_argument('--enable', action='store_true', help='Point NGINX_CONF in .env at the generated profile')
+    args = parser.parse_args()
+
+    locations = get_enabled_locations(load_site_config(args.site_id))
+    with open(args.output, 'w') as f:
+        f.write(render_nginx_conf(locations))
+    print(f"✅ Generated nginx profile with {', '.join(location[0] for location in locations) or 'no'} locations at {args.output}")
+
+    if args.enable:
+        enable_nginx_profile(args.output)
+        print(f'✅ Set NGINX_CONF={args.output} in {WORKING_DIR}/.env')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Module Reconciler
+
+Diffs the desired module manifest (requests/setup-modules.json) against the running containers
+and only pulls and recreates the modules that changed, so a module version bump does not
+restart the whole stack. A module is recreated when its container is missing or stopped, runs
+a different image reference or digest, or its environment hash differs from the desired one.
+
+Modules are rolled out in startup_order waves; modules inside a wave are recreated in parallel
+and every module of a wave must be healthy (or running, without a healthcheck) before the next
+wave starts. Modules that are services of a compose file in $WORKING_DIR are recreated through
+docker compose, so their volumes, ports and env files are kept. Their desired environment is
+the one compose resolves, since that is what compose applies. When the manifest image differs
+from the compose image, the compose image must be parametrized (image: ${VAR:-default}); VAR is
+then set in $WORKING_DIR/.env so later compose runs keep the manifest image. Other manifests
+that disagree with compose are rejected.
+
+Other modules are recreated with docker run, reusing the mounts, ports, networks, devices,
+labels and other host settings of the container they replace.
+
+Usage:
+    python reconcile_modules.py [--manifest <path>] [--max-parallel N] [--dry-run]
+
+Example:
+    sudo -E python3 reconcile_modules.py --dry-run
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+import yaml
+
+WORKING_DIR = os.environ.get('WORKING_DIR', os.getcwd())
+MANIFEST_PATH = os.path.join(WORKING_DIR, 'requests', 'setup-modules.json')
+ENV_PATH = os.path.join(WORKING_DIR, '.env')
+DOCKER_NETWORK = 'azure-iot-edge'
+IMAGE_VARIABLE_PATTERN = re.compile(r'^\$\{(\w+)(?::?-[^}]*)?\}$')
+ENV_FILE_LOCK = threading.Lock()
+
+
+def docker(*args, check=True):
+    """Run a docker CLI command and return its stdout."""
+    result = subprocess.run(['docker', *args], capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"docker {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def env_hash(env: dict) -> str:
+    """Hash of an environment mapping, independent of key order."""
+    return hashlib.sha256(json.dumps(env, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def find_compose_services() -> dict:
+    """Map container names to (compose file, service) for the compose files in the working directory."""
+    services = {}
+    for compose_path in sorted(glob.glob(os.path.join(WORKING_DIR, 'docker-compose*.yml'))):
+        if '.local.' in compose_path:
+            continue
+        with open(compose_path, 'r') as f:
+            compose = yaml.safe_load(f) or {}
+        for service, service_config in (compose.get('services') or {}).items():
+            container_name = service_config.get('container_name')
+            if container_name and container_name not in services:
+                services[container_name] = (compose_path, service)
+    return services
+
+
+def compose_service_config(compose_path: str, service: str, interpolate=True) -> dict:
+    """Return the config docker compose resolves for a service, optionally without interpolating variables."""
+    args = ['compose', '-f', compose_path, 'config', '--format', 'json']
+    if not interpolate:
+        args.append('--no-interpolate')
+    return json.loads(docker(*args))['services'][service]
+
+
+def compose_image_variable(compose_path: str, service: str):
+    """Return the variable of a parametrized compose image (image: ${VAR:-default}), or None."""
+    match = IMAGE_VARIABLE_PATTERN.match(compose_service_config(compose_path, service, interpolate=False).get('image', ''))
+    return match.group(1) if match else None
+
+
+def set_env_value(key: str, value: str):
+    """Set a variable in the main .env file, which docker compose reads for interpolation."""
+    with ENV_FILE_LOCK:
+        lines = []
+        if os.path.exists(ENV_PATH):
+            with open(ENV_PATH, 'r') as f:
+                lines = [line if line.endswith('\n') else f'{line}\n' for line in f.readlines()]
+        for i, line in enumerate(lines):
+            if line.strip().startswith(f'{key}='):
+                lines[i] = f'{key}={value}\n'
+                break
+        else:
+            lines.append(f'{key}={value}\n')
+        with open(ENV_PATH, 'w') as f:
+            f.writelines(lines)
+
+
+def inspect_container(name: str):
+    """Return the docker inspect data of a container, or None if it does not exist."""
+    output = docker('inspect', '--type', 'container', name, check=False)
+    return json.loads(output)[0] if output else None
+
+
+def local_image_id(image: str):
+    """Return the local image id of an image reference, or None if it is not pulled."""
+    return docker('image', 'inspect', '--format', '{{.Id}}', image, check=False)
+
+
+def remote_digest(image: str):
+    """Return the registry digest of an image reference, or None if the registry is unreachable."""
+    result = subprocess.run(['docker', 'buildx', 'imagetools', 'inspect', image, '--format', '{{.Manifest.Digest}}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.warning(f"Could not read the registry digest of {image}, keeping the local image: {result.stderr.strip()}")
+        return None
+    return result.stdout.strip()
+
+
+def image_is_current(image: str) -> bool:
+    """Whether the local copy of the image matches the registry (assumed when the registry is unreachable)."""
+    repo_digests = docker('image', 'inspect', '--format', '{{json .RepoDigests}}', image, check=False)
+    if repo_digests is None:
+        return False
+    digest = remote_digest(image)
+    return digest is None or any(d.endswith(f'@{digest}') for d in json.loads(repo_digests))
+
+
+def plan_module(module: dict, compose_services: dict) -> dict:
+    """
+    Compare one desired module with its container and return the reconcile plan for it.
+    """
+    name = module['name']
+    compose_service = compose_services.get(name)
+    image_variable = None
+    if compose_service:
+        service_config = compose_service_config(*compose_service)
+        desired_env = service_config.get('environment') or {}
+        if service_config.get('image') != module['image']:
+            # compose would keep recreating the container from its own image otherwise
+            image_variable = compose_image_variable(*compose_service)
+            if image_variable is None:
+                raise ValueError(
+                    f"Module '{name}' wants {module['image']} but {compose_service[0]} runs {service_config.get('image')} "
+                    f"for service '{compose_service[1]}'. Update the compose file or parametrize its image."
+                )
+    else:
+        desired_env = module.get('env') or {}
+    container = inspect_container(name)
+
+    reasons = []
+    pull = not image_is_current(module['image'])
+    if pull:
+        reasons.append('image digest changed')
+
+    if container is None:
+        reasons.append('container missing')
+    else:
+        container_env = dict(item.split('=', 1) for item in container['Config']['Env'] or [])
+        running_env = {key: container_env.get(key) for key in desired_env}
+        if not container['State']['Running']:
+            reasons.append('container not running')
+        if container['Config']['Image'] != module['image']:
+            reasons.append(f"image {container['Config']['Image']} -> {module['image']}")
+        elif not pull and container['Image'] != local_image_id(module['image']):
+            reasons.append('container runs an outdated image')
+        if env_hash(running_env) != env_hash(desired_env):
+            reasons.append('env changed')
+
+    return {
+        'module': module,
+        'compose_service': compose_service,
+        'image_variable': image_variable,
+        'container': container,
+        'env': desired_env,
+        'pull': pull,
+        'reasons': reasons,
+    }
+
+
+def primary_network(container: dict) -> str:
+    """The network a container was started on (docker's 'default' network mode is the bridge network)."""
+    network_mode = container['HostConfig'].get('NetworkMode') or 'default'
+    return 'bridge' if network_mode == 'default' else network_mode
+
+
+def container_run_args(container: dict, desired_env: dict) -> list:
+    """
+    Rebuild the docker run arguments of a container, so the container recreated from the new image keeps
+    its mounts, ports, networks, devices, labels and host settings. Environment variables and labels that
+    came from the old image are left to the new image.
+    """
+    image_config = json.loads(docker('image', 'inspect', '--format', '{{json .Config}}', container['Image'], check=False) or '{}')
+    image_env = set(image_config.get('Env') or [])
+    image_labels = image_config.get('Labels') or {}
+    host_config = container['HostConfig']
+    args = []
+
+    for mount in container['Mounts']:
+        if mount['Type'] == 'tmpfs':
+            args += ['--tmpfs', mount['Destination']]
+            continue
+        source = mount['Name'] if mount['Type'] == 'volume' else mount['Source']
+        args += ['-v', f"{source}:{mount['Destination']}{'' if mount['RW'] else ':ro'}"]
+
+    args += ['--network', primary_network(container)]
+    for container_port, bindings in (host_config.get('PortBindings') or {}).items():
+        for binding in bindings or []:
+            host = f"{binding['HostIp']}:" if binding.get('HostIp') else ''
+            args += ['-p', f"{host}{binding.get('HostPort', '')}:{container_port}"]
+
+    restart_policy = host_config.get('RestartPolicy') or {}
+    if restart_policy.get('Name'):
+        retries = restart_policy.get('MaximumRetryCount')
+        args += ['--restart', f"{restart_policy['Name']}:{retries}" if restart_policy['Name'] == 'on-failure' and retries else restart_policy['Name']]
+    if host_config.get('Privileged'):
+        args.append('--privileged')
+    for capability in host_config.get('CapAdd') or []:
+        args += ['--cap-add', capability]
+    for device in host_config.get('Devices') or []:
+        args += ['--device', f"{device['PathOnHost']}:{device['PathInContainer']}:{device['CgroupPermissions']}"]
+    for host in host_config.get('ExtraHosts') or []:
+        args += ['--add-host', host]
+    log_config = host_config.get('LogConfig') or {}
+    if log_config.get('Type'):
+        args += ['--log-driver', log_config['Type']]
+        for key, value in (log_config.get('Config') or {}).items():
+            args += ['--log-opt', f'{key}={value}']
+
+    for key, value in (container['Config'].get('Labels') or {}).items():
+        if image_labels.get(key) != value:
+            args += ['--label', f'{key}={value}']
+    env = dict(item.split('=', 1) for item in container['Config']['Env'] or [] if item not in image_env)
+    env.update(desired_env)
+    for key, value in env.items():
+        args += ['-e', f'{key}={value}']
+    return args
+
+
+def wait_until_healthy(name: str, timeout: float):
+    """Wait until the container is healthy, or running if it has no healthcheck."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        container = inspect_container(name)
+        state = container['State'] if container else {}
+        health = state.get('Health', {}).get('Status')
+        if state.get('Running') and health in (None, 'healthy'):
+            return
+        time.sleep(1)
+    raise RuntimeError(f"Module '{name}' did not become healthy within {timeout:.0f}s")
+
+
+def apply_plan(plan: dict, health_timeout: float) -> float:
+    """Pull and recreate one module. Returns its downtime in seconds."""
+    module = plan['module']
+    name = module['name']
+    if plan['pull']:
+        docker('pull', module['image'])
+
+    start = time.monotonic()
+    if plan['compose_service']:
+        compose_path, service = plan['compose_service']
+        if plan['image_variable']:
+            set_env_value(plan['image_variable'], module['image'])
+        docker('compose', '-f', compose_path, 'up', '-d', '--no-deps', '--force-recreate', service)
+    elif plan['container']:
+        old_container = plan['container']
+        run_args = container_run_args(old_container, plan['env'])
+        docker('rm', '-f', name)
+        docker('run', '-d', '--name', name, *run_args, module['image'])
+        # docker run attaches a single network, connect the others the old container was on
+        for network in old_container['NetworkSettings'].get('Networks') or {}:
+            if network not in (primary_network(old_container), 'host', 'none'):
+                docker('network', 'connect', network, name)
+    else:
+        env_args = [arg for key, value in plan['env'].items() for arg in ('-e', f'{key}={value}')]
+        docker('run', '-d', '--name', name, '--restart', 'unless-stopped', '--network', DOCKER_NETWORK,
+               *env_args, module['image'])
+    wait_until_healthy(name, health_timeout)
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recreate only the modules whose image or env changed.')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Path to the desired module manifest.')
+    parser.add_argument('--max-parallel', type=int, default=4, help='Maximum modules recreated at once within a wave.')
+    parser.add_argument('--health-timeout', type=float, default=300, help='Seconds to wait for a module to become healthy.')
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would be recreated.')
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r') as f:
+        modules = json.load(f)['modules']
+    compose_services = find_compose_services()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.max_parallel) as executor:
+            plans = list(executor.map(lambda module: plan_module(module, compose_services), modules))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    for plan in plans:
+        status = ', '.join(plan['reasons']) if plan['reasons'] else 'up to date'
+        print(f"[{plan['module']['startup_order']}] {plan['module']['name']}: {status}")
+
+    changed = sorted((plan for plan in plans if plan['reasons']), key=lambda plan: plan['module']['startup_order'])
+    if not changed:
+        print('✅ All modules are up to date')
+        return 0
+    if args.dry_run:
+        return 0
+
+    for startup_order, wave in groupby(changed, key=lambda plan: plan['module']['startup_order']):
+        wave = list(wave)
+        print(f"Recreating wave {startup_order}: {', '.join(plan['module']['name'] for plan in wave)}")
+        with ThreadPoolExecutor(max_workers=args.max_parallel) as executor:
+            futures = {plan['module']['name']: executor.submit(apply_plan, plan, args.health_timeout) for plan in wave}
+        for name, future in futures.items():
+            try:
+                print(f"✅ {name} recreated ({future.result():.1f}s downtime)")
+            except Exception as e:
+                print(f"❌ {name} failed: {e}")
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
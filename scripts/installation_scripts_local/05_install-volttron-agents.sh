@@ -4,20 +4,28 @@
 #
 # This script is a wrapper that calls the main install_agents.py script from alto_os.
 # It handles activating the virtual environment and passing the correct site config directory.
+# Agents are installed one by one by install_agents_parallel.py, and agents whose config section
+# and package are unchanged since their last install on this platform, and are still listed by
+# vctl, are skipped.
 #
 # Usage:
-#   ./05_install-volttron-agents.sh <site_id>
+#   ./05_install-volttron-agents.sh <site_id> [--workers N] [--force]
+#
+# Arguments:
+#   --workers: Maximum number of agents installed at once (default: 1, values above 1 are experimental).
+#   --force: Reinstall every agent even if it is unchanged.
 
 set -e
 
 # Check if site_id is provided
-if [ "$#" -ne 1 ]; then
+if [ "$#" -lt 1 ]; then
     echo "Error: Missing site ID argument."
-    echo "Usage: $0 <site_id>"
+    echo "Usage: $0 <site_id> [--workers N] [--force]"
     exit 1
 fi
 
 SITE_ID="$1"
+shift
 
 # Check if WORKING_DIR is set
 if [ -z "$WORKING_DIR" ]; then
@@ -45,11 +53,11 @@ echo "Installing VOLTTRON agents with config: $SITE_CONFIG_PATH"
 # Activate the VOLTTRON environment
 source "${WORKING_DIR}/volttron/env/bin/activate"
 
-# Run the install_agents.py script
-python "$INSTALL_SCRIPT_PATH" "$SITE_ID" --site_config_dir "${WORKING_DIR}/site_configs"
+# Validate and compile the site config once, install_agents_parallel.py loads it through the compiled artifact
+python "${WORKING_DIR}/scripts/config_check_scripts/compile_site_config.py" "$SITE_ID"
 
-# Check if the installation was successful
-if [ $? -eq 0 ]; then
+# Run the install_agents.py script for every changed agent
+if python "${WORKING_DIR}/scripts/installation_scripts_local/install_agents_parallel.py" "$SITE_ID" "$@"; then
     echo "✅ Successfully installed VOLTTRON agents."
 else
     echo "Error: Failed to install VOLTTRON agents."
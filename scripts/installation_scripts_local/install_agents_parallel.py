@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Parallel VOLTTRON Agent Installer
+
+Runs alto_os/scripts/install_agents.py once per agent configured under volttron_agents. Each
+run gets a copy of the site config that only contains its own agent, so agents install
+independently of each other.
+
+Agents whose config section and package are unchanged since their last successful install
+are skipped, as long as the agent's VIP identity is still listed by `vctl list`. The identity
+is taken from the agent's config (vip_identity or identity) or else from the `vctl list` rows
+whose identity or agent name contains the agent's name; an agent whose identity cannot be
+found is always reinstalled. The install state is kept per VOLTTRON platform instance, so re-creating the platform
+reinstalls every agent. The package fingerprint is the git tree hash of the agent's
+directory in the alto_os submodule, or the submodule commit when no single directory
+matches the agent.
+
+Agents are installed one at a time by default. Concurrent installs (--workers above 1) are
+experimental: every install goes through the same platform's control agent, and installing
+several agents into one platform at once has not been tested.
+
+Usage:
+    python install_agents_parallel.py <site_id> [--workers N] [--force]
+
+Called by 05_install-volttron-agents.sh.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+WORKING_DIR = os.environ["WORKING_DIR"]
+ALTO_OS_DIR = os.path.join(WORKING_DIR, 'alto_os')
+INSTALL_SCRIPT_PATH = os.path.join(ALTO_OS_DIR, 'scripts', 'install_agents.py')
+STATE_DIR = os.path.join(WORKING_DIR, '.agent_install_state')
+VOLTTRON_HOME = os.environ.get('VOLTTRON_HOME', os.path.expanduser('~/.volttron'))
+
+sys.path.append(os.path.join(WORKING_DIR, 'scripts', 'config_check_scripts'))
+from compile_site_config import load_site_config  # noqa: E402
+
+
+def git_output(*args):
+    """Return the stdout of a git command in the alto_os submodule, or None if it fails."""
+    result = subprocess.run(['git', '-C', ALTO_OS_DIR, *args], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def normalize_agent_name(name: str) -> str:
+    """Lowercase an agent or directory name and drop separators and a trailing 'agent'."""
+    name = ''.join(c for c in name.lower() if c.isalnum())
+    return name[:-len('agent')] if name.endswith('agent') and name != 'agent' else name
+
+
+def find_agent_package(agent: str):
+    """Return the alto_os directory of the agent's package, or None unless exactly one matches."""
+    target = normalize_agent_name(agent)
+    candidates = []
+    for root, dirs, _ in os.walk(ALTO_OS_DIR):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        if os.path.relpath(root, ALTO_OS_DIR).count(os.sep) >= 1:
+            dirs[:] = []  # Agent packages live at most two levels down, e.g. agents/BACnetAgent
+        candidates.extend(os.path.join(root, d) for d in dirs if normalize_agent_name(d) == target)
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def package_fingerprint(agent: str) -> str:
+    """Git tree hash of the agent's package directory, falling back to the alto_os commit."""
+    package_dir = find_agent_package(agent)
+    if package_dir:
+        # Include uncommitted changes so a locally edited agent is reinstalled
+        relative_path = os.path.relpath(package_dir, ALTO_OS_DIR)
+        tree = git_output('rev-parse', f'HEAD:{relative_path}')
+        dirty = git_output('status', '--porcelain', '--', relative_path)
+        if tree is not None:
+            return f'{tree}{"+dirty" if dirty else ""}'
+    return git_output('rev-parse', 'HEAD') or 'unknown'
+
+
+def agent_fingerprint(agent: str, agent_config) -> str:
+    """Fingerprint of an agent's config section and package."""
+    config_hash = hashlib.sha256(json.dumps(agent_config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{config_hash[:16]}:{package_fingerprint(agent)}'
+
+
+def platform_instance() -> str:
+    """
+    Identify the VOLTTRON platform instance by its home directory and keystore, which is
+    generated again when the platform is re-created.
+    """
+    instance = hashlib.sha256(os.path.realpath(VOLTTRON_HOME).encode('utf-8'))
+    keystore_path = os.path.join(VOLTTRON_HOME, 'keystore')
+    if os.path.exists(keystore_path):
+        with open(keystore_path, 'rb') as f:
+            instance.update(f.read())
+    else:
+        instance.update(str(os.stat(VOLTTRON_HOME).st_ctime_ns if os.path.isdir(VOLTTRON_HOME) else 0).encode('utf-8'))
+    return instance.hexdigest()
+
+
+def installed_agents():
+    """Return the (agent name, VIP identity) rows of `vctl list`, or None if vctl fails."""
+    try:
+        result = subprocess.run(['vctl', 'list'], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    # Rows are "<uuid prefix> <agent> <identity> [<tag>] [<priority>]" after the header line
+    rows = []
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and fields[0] != 'AGENT':
+            rows.append((fields[1], fields[2]))
+    return rows
+
+
+def agent_identities(agent: str, agent_config, rows: list) -> list:
+    """Return the VIP identities of an agent among the `vctl list` rows."""
+    if isinstance(agent_config, dict):
+        configured = agent_config.get('vip_identity') or agent_config.get('identity')
+        if configured:
+            return [identity for _, identity in rows if identity == configured]
+    target = normalize_agent_name(agent)
+    return sorted({
+        identity for agent_name, identity in rows
+        if target in normalize_agent_name(identity) or target in normalize_agent_name(agent_name)
+    })
+
+
+def load_install_state(site_id: str) -> dict:
+    """Return the {agent: {fingerprint, identities}} install state of the current platform instance."""
+    state_path = os.path.join(STATE_DIR, f'{site_id}.json')
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    return state.get('agents', {}) if state.get('instance') == platform_instance() else {}
+
+
+def save_install_state(site_id: str, agents: dict):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(os.path.join(STATE_DIR, f'{site_id}.json'), 'w') as f:
+        json.dump({'instance': platform_instance(), 'agents': agents}, f, indent=2)
+
+
+def is_installed(agent_state: dict, fingerprint: str, identities) -> bool:
+    """
+    Whether an agent was installed with this fingerprint and its identities are still on the platform.
+    An agent without recorded identities cannot be verified, so it is not considered installed.
+    """
+    recorded = set(agent_state.get('identities') or [])
+    return (
+        identities is not None
+        and bool(recorded)
+        and agent_state.get('fingerprint') == fingerprint
+        and recorded <= identities
+    )
+
+
+def install_agent(site_id: str, site_config: dict, agent: str, work_dir: str) -> dict:
+    """
+    Install a single agent from a site config copy that only contains that agent.
+    """
+    agent_dir = os.path.join(work_dir, agent)
+    os.makedirs(agent_dir)
+    agent_site_config = dict(site_config, volttron_agents={agent: site_config['volttron_agents'][agent]})
+    with open(os.path.join(agent_dir, f'{site_id}.yaml'), 'w') as f:
+        yaml.dump(agent_site_config, f, default_flow_style=False, sort_keys=False)
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, INSTALL_SCRIPT_PATH, site_id, '--site_config_dir', agent_dir],
+        capture_output=True, text=True,
+    )
+    duration = time.perf_counter() - start
+    return {
+        'agent': agent,
+        'duration': duration,
+        'success': result.returncode == 0,
+        'output': result.stdout + result.stderr,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Install VOLTTRON agents concurrently with per-agent timing.')
+    parser.add_argument('site_id', help='Id of the site configuration to use.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Maximum number of agents installed at once (default: 1). Values above 1 are experimental.')
+    parser.add_argument('--force', action='store_true', help='Reinstall agents even if they are unchanged.')
+    args = parser.parse_args()
+
+    site_config = load_site_config(args.site_id)
+    agents = site_config.get('volttron_agents') or {}
+    state = {} if args.force else load_install_state(args.site_id)
+    rows = installed_agents()
+    identities = None if rows is None else {identity for _, identity in rows}
+    if identities is None:
+        print("⚠️  Could not list the installed agents with vctl, installing every agent")
+
+    fingerprints = {agent: agent_fingerprint(agent, agent_config) for agent, agent_config in agents.items()}
+    to_install = [agent for agent in agents if not is_installed(state.get(agent) or {}, fingerprints[agent], identities)]
+    for agent in agents:
+        if agent not in to_install:
+            print(f"⏭️  {agent}: unchanged and still installed, skipping")
+    if not to_install:
+        print("✅ All VOLTTRON agents are up to date.")
+        return 0
+
+    if args.workers > 1:
+        print(f"⚠️  Concurrent installs are experimental, installing with {args.workers} workers into one platform. Use --workers 1 if installs fail")
+    print(f"Installing {len(to_install)} agents with {args.workers} workers: {', '.join(to_install)}")
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda agent: install_agent(args.site_id, site_config, agent, work_dir), to_install))
+
+    # Only remember successful installs so failed agents are retried next time
+    state = load_install_state(args.site_id)
+    rows = installed_agents() or []
+    for result in results:
+        if result['success']:
+            agent_ids = agent_identities(result['agent'], agents[result['agent']], rows)
+            if not agent_ids:
+                print(f"⚠️  {result['agent']}: no matching identity in vctl list, it will be reinstalled next time")
+            state[result['agent']] = {'fingerprint': fingerprints[result['agent']], 'identities': agent_ids}
+    save_install_state(args.site_id, state)
+
+    print("\nAgent install durations:")
+    for result in sorted(results, key=lambda r: r['duration'], reverse=True):
+        status = '✅' if result['success'] else '❌'
+        print(f"  {status} {result['agent']:<30} {result['duration']:7.1f}s")
+    print(f"  Total wall time: {time.perf_counter() - start:.1f}s")
+
+    failed = [result for result in results if not result['success']]
+    for result in failed:
+        print(f"\n❌ {result['agent']} failed. Last output lines:")
+        print('\n'.join(result['output'].strip().splitlines()[-20:]))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Alto Gateway Metrics Exporter
+
+Collects gateway performance metrics on an interval and serves the latest values as a
+Prometheus text endpoint (/metrics). Every collection is also appended as a JSON line to a
+rolling local file. Metrics are collected in a background thread, so scrapes only return the
+cached text and never hit docker or the database.
+
+Collected metrics:
+  - container running state, restart count, health and last healthcheck duration
+  - TimescaleDB hypertable sizes, chunk counts and ingest rows/sec
+  - duration, point counts and result of the last BACnet point check
+  - host CPU usage, load average, memory and temperature (lm-sensors, falling back to sysfs)
+
+Enabled through 'metrics-exporter' in deployment_config.enabled_services and started by
+start.sh. By default it only listens on the docker bridge gateway, which is reachable from the
+host and its containers but not from the gateway LAN. The tuned nginx profile from
+generate_nginx_conf.py proxies /metrics to it when the exporter is enabled; the stock
+nginx.conf does not.
+
+Usage:
+    python alto_metrics_exporter.py [--port 9108] [--interval 15]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORKING_DIR = os.environ.get('WORKING_DIR', os.getcwd())
+METRICS_DIR = os.path.join(WORKING_DIR, 'metrics')
+BACNET_CHECK_METRICS_PATH = os.path.join(METRICS_DIR, 'bacnet_check.json')
+CONTAINERS = ['infra_timescaledb', 'infra_mongodb', 'nginx-proxy', 'supabase-db', 'supabase-kong']
+TIMESCALEDB_CONTAINER = 'infra_timescaledb'
+
+HYPERTABLES_QUERY = """
+SELECT format('%I.%I', hypertable_schema, hypertable_name),
+       hypertable_size(format('%I.%I', hypertable_schema, hypertable_name)::regclass),
+       num_chunks
+FROM timescaledb_information.hypertables
+"""
+# name: (type, help) of every exported metric
+METRICS = {
+    'alto_container_running': ('gauge', 'Whether the container is running.'),
+    'alto_container_restarts_total': ('counter', 'Number of times docker restarted the container.'),
+    'alto_container_healthy': ('gauge', 'Whether the container healthcheck reports healthy.'),
+    'alto_container_healthcheck_duration_seconds': ('gauge', 'Duration of the last container healthcheck.'),
+    'alto_timescaledb_hypertable_bytes': ('gauge', 'Total size of the hypertable.'),
+    'alto_timescaledb_hypertable_chunks': ('gauge', 'Number of chunks of the hypertable.'),
+    'alto_timescaledb_chunk_avg_bytes': ('gauge', 'Average chunk size of the hypertable.'),
+    'alto_timescaledb_rows_inserted_total': ('counter', 'Rows inserted into hypertable chunks since the statistics reset.'),
+    'alto_timescaledb_ingest_rows_per_second': ('gauge', 'Rows inserted per second since the previous collection.'),
+    'alto_bacnet_check_timestamp_seconds': ('gauge', 'Start time of the last BACnet point check.'),
+    'alto_bacnet_check_duration_seconds': ('gauge', 'Duration of the last BACnet point check.'),
+    'alto_bacnet_scan_duration_seconds': ('gauge', 'Duration of the BACnet scan of the last point check.'),
+    'alto_bacnet_servers': ('gauge', 'BACnet servers scanned by the last point check.'),
+    'alto_bacnet_scanned_points': ('gauge', 'Points scanned by the last point check.'),
+    'alto_bacnet_configured_points': ('gauge', 'Points configured in the site config at the last point check.'),
+    'alto_bacnet_check_passed': ('gauge', 'Whether the last BACnet point check passed.'),
+    'alto_host_cpu_usage_ratio': ('gauge', 'Host CPU usage since the previous collection.'),
+    'alto_host_load_average': ('gauge', 'Host load average.'),
+    'alto_host_memory_total_bytes': ('gauge', 'Host total memory.'),
+    'alto_host_memory_available_bytes': ('gauge', 'Host available memory.'),
+    'alto_host_temperature_celsius': ('gauge', 'Host temperature sensor reading.'),
+    'alto_exporter_collect_duration_seconds': ('gauge', 'Duration of the last metrics collection.'),
+}
+
+CHUNK_INSERTS_QUERY = "SELECT COALESCE(SUM(n_tup_ins), 0) FROM pg_stat_user_tables WHERE schemaname = '_timescaledb_internal'"
+
+
+def run_command(*args):
+    """Run a command and return its stdout, or None if it fails or is not installed."""
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def parse_docker_time(value: str) -> float:
+    """Parse a docker RFC 3339 timestamp (nanosecond precision) into epoch seconds."""
+    value = re.sub(r'(\.\d{6})\d+', r'\1', value.replace('Z', '+00:00'))
+    return datetime.fromisoformat(value).timestamp()
+
+
+def collect_container_metrics(samples: list):
+    """Container state, restarts and healthcheck latency."""
+    # docker inspect prints the containers it found and fails only because of the missing ones
+    result = subprocess.run(['docker', 'inspect', '--type', 'container', *CONTAINERS], capture_output=True, text=True, timeout=30)
+    for container in json.loads(result.stdout or '[]'):
+        labels = {'container': container['Name'].lstrip('/')}
+        state = container['State']
+        samples.append(('alto_container_running', labels, int(state['Running'])))
+        samples.append(('alto_container_restarts_total', labels, container['RestartCount']))
+        health = state.get('Health')
+        if health:
+            samples.append(('alto_container_healthy', labels, int(health['Status'] == 'healthy')))
+            if health.get('Log'):
+                last_check = health['Log'][-1]
+                duration = parse_docker_time(last_check['End']) - parse_docker_time(last_check['Start'])
+                samples.append(('alto_container_healthcheck_duration_seconds', labels, duration))
+
+
+def collect_timescaledb_metrics(samples: list, state: dict):
+    """Hypertable sizes, chunk counts and ingest rate."""
+    psql = ['docker', 'exec', TIMESCALEDB_CONTAINER, 'psql', '-U', 'postgres', '-At', '-F', '\t', '-c']
+    output = run_command(*psql, HYPERTABLES_QUERY)
+    for line in (output or '').splitlines():
+        hypertable, size, chunks = line.split('\t')
+        labels = {'hypertable': hypertable}
+        samples.append(('alto_timescaledb_hypertable_bytes', labels, int(size or 0)))
+        samples.append(('alto_timescaledb_hypertable_chunks', labels, int(chunks)))
+        if int(chunks):
+            samples.append(('alto_timescaledb_chunk_avg_bytes', labels, int(size or 0) / int(chunks)))
+
+    output = run_command(*psql, CHUNK_INSERTS_QUERY)
+    if output:
+        rows_inserted, now = int(output), time.monotonic()
+        samples.append(('alto_timescaledb_rows_inserted_total', {}, rows_inserted))
+        if 'rows_inserted' in state and rows_inserted >= state['rows_inserted']:
+            rate = (rows_inserted - state['rows_inserted']) / (now - state['rows_inserted_at'])
+            samples.append(('alto_timescaledb_ingest_rows_per_second', {}, rate))
+        state['rows_inserted'], state['rows_inserted_at'] = rows_inserted, now
+
+
+def collect_bacnet_check_metrics(samples: list):
+    """Result of the last check_exported_bacnet_points.py run."""
+    if not os.path.exists(BACNET_CHECK_METRICS_PATH):
+        return
+    with open(BACNET_CHECK_METRICS_PATH, 'r') as f:
+        metrics = json.load(f)
+    samples.append(('alto_bacnet_check_timestamp_seconds', {}, metrics['timestamp']))
+    samples.append(('alto_bacnet_check_duration_seconds', {}, metrics['check_duration_seconds']))
+    samples.append(('alto_bacnet_scan_duration_seconds', {}, metrics['scan_duration_seconds']))
+    samples.append(('alto_bacnet_servers', {}, metrics['servers']))
+    samples.append(('alto_bacnet_scanned_points', {}, metrics['scanned_points']))
+    samples.append(('alto_bacnet_configured_points', {}, metrics['configured_points']))
+    samples.append(('alto_bacnet_check_passed', {}, int(metrics['passed'])))
+
+
+def read_cpu_times():
+    """Return (busy, total) jiffies from /proc/stat."""
+    with open('/proc/stat', 'r') as f:
+        values = [int(value) for value in f.readline().split()[1:]]
+    idle = values[3] + values[4]
+    return sum(values) - idle, sum(values)
+
+
+def collect_host_metrics(samples: list, state: dict):
+    """Host CPU, load, memory and temperature."""
+    busy, total = read_cpu_times()
+    if 'cpu_times' in state and total > state['cpu_times'][1]:
+        samples.append(('alto_host_cpu_usage_ratio', {}, (busy - state['cpu_times'][0]) / (total - state['cpu_times'][1])))
+    state['cpu_times'] = (busy, total)
+
+    for period, load in zip(['1m', '5m', '15m'], os.getloadavg()):
+        samples.append(('alto_host_load_average', {'period': period}, load))
+
+    with open('/proc/meminfo', 'r') as f:
+        meminfo = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in f}
+    samples.append(('alto_host_memory_total_bytes', {}, meminfo['MemTotal']))
+    samples.append(('alto_host_memory_available_bytes', {}, meminfo['MemAvailable']))
+
+    temperatures = {}
+    output = run_command('sensors', '-j')
+    if output:
+        for chip, features in json.loads(output).items():
+            for feature, readings in features.items():
+                if isinstance(readings, dict):
+                    for key, value in readings.items():
+                        if key.startswith('temp') and key.endswith('_input'):
+                            temperatures[f'{chip}/{feature}'] = value
+    else:
+        for zone in glob.glob('/sys/class/thermal/thermal_zone*'):
+            with open(os.path.join(zone, 'temp'), 'r') as f:
+                temperatures[os.path.basename(zone)] = int(f.read()) / 1000
+    for sensor, value in temperatures.items():
+        samples.append(('alto_host_temperature_celsius', {'sensor': sensor}, value))
+
+
+def format_prometheus(samples: list) -> str:
+    """Render samples in the Prometheus text exposition format, grouped by metric with HELP and TYPE lines."""
+    families = {}
+    for name, labels, value in samples:
+        families.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, family in families.items():
+        metric_type, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in family:
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def docker_bridge_gateway() -> str:
+    """Address of the docker bridge gateway (what host.docker.internal resolves to), or localhost."""
+    return run_command('docker', 'network', 'inspect', 'bridge', '--format', '{{(index .IPAM.Config 0).Gateway}}') or '127.0.0.1'
+
+
+class MetricsCollector(threading.Thread):
+    """
+    Collect all metrics every `interval` seconds and keep the latest Prometheus text.
+    """
+
+    def __init__(self, interval: float, history_logger: logging.Logger):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.history_logger = history_logger
+        self.state = {}
+        self.text = ''
+
+    def collect(self):
+        samples = []
+        start = time.perf_counter()
+        for collector in [
+            collect_container_metrics,
+            lambda s: collect_timescaledb_metrics(s, self.state),
+            collect_bacnet_check_metrics,
+            lambda s: collect_host_metrics(s, self.state),
+        ]:
+            try:
+                collector(samples)
+            except Exception as e:
+                logging.warning(f"Metrics collection failed: {e}")
+        samples.append(('alto_exporter_collect_duration_seconds', {}, time.perf_counter() - start))
+
+        self.text = format_prometheus(samples)
+        self.history_logger.info(json.dumps({
+            'timestamp': time.time(),
+            'samples': [[name, labels, value] for name, labels, value in samples],
+        }))
+
+    def run(self):
+        while True:
+            self.collect()
+            time.sleep(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Alto gateway performance metrics for Prometheus.')
+    parser.add_argument('--host', help='Address to listen on (default: the docker bridge gateway nginx reaches through host.docker.internal).')
+    parser.add_argument('--port', type=int, default=9108, help='Port to listen on.')
+    parser.add_argument('--interval', type=float, default=15, help='Seconds between collections.')
+    parser.add_argument('--history-max-bytes', type=int, default=10 * 1024 * 1024, help='Size of each rolling history file.')
+    parser.add_argument('--history-backups', type=int, default=5, help='Number of rolled history files to keep.')
+    args = parser.parse_args()
+    if args.host is None:
+        args.host = docker_bridge_gateway()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    history_logger = logging.getLogger('alto_metrics_history')
+    history_logger.propagate = False
+    history_logger.setLevel(logging.INFO)
+    history_logger.addHandler(logging.handlers.RotatingFileHandler(
+        os.path.join(METRICS_DIR, 'alto_metrics.jsonl'), maxBytes=args.history_max_bytes, backupCount=args.history_backups,
+    ))
+
+    collector = MetricsCollector(args.interval, history_logger)
+    collector.start()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = collector.text.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"✅ Serving Alto metrics on http://{args.host}:{args.port}/metrics")
+    ThreadingHTTPServer((args.host, args.port), MetricsHandler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -21,12 +21,30 @@ fi
 
 source $WORKING_DIR/volttron/env/bin/activate
 
+# Compile the site config once, the steps below read the compiled artifact instead of the YAML
+COMPILED_SITE_CONFIG="$WORKING_DIR/site_configs/.compiled/${site_id}.json"
+if ! python3 $WORKING_DIR/scripts/config_check_scripts/compile_site_config.py $site_id; then
+    if [[ ! "$*" =~ "--ignore-bacnet-check" ]]; then
+        echo "Failed to compile site config"
+        return 1
+    fi
+    echo "Failed to compile site config, reading the YAML directly (--ignore-bacnet-check)"
+    COMPILED_SITE_CONFIG=""
+fi
+LOAD_SITE_CONFIG="
+import json
+import yaml
+if '${COMPILED_SITE_CONFIG}':
+    with open('${COMPILED_SITE_CONFIG}', 'r') as f:
+        config = json.load(f)['site_config']
+else:
+    with open(f'site_configs/${site_id}.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+"
+
 # Read enabled services from site config
 echo "Reading services from site config..."
-SERVICES_STATUS=$(python3 -c "
-import yaml
-with open(f'site_configs/${site_id}.yaml', 'r') as f:
-    config = yaml.safe_load(f)
+SERVICES_STATUS=$(python3 -c "${LOAD_SITE_CONFIG}
 enabled_services = []
 all_services = []
 for service, enabled in config['deployment_config']['enabled_services'].items():
@@ -53,14 +71,25 @@ else
     echo "Skipping BACnet points check..."
 fi
 
+# Regenerate the tuned nginx profile if it is in use, so it proxies the services enabled now (e.g. /metrics)
+NGINX_CONF_PATH=$(grep -E '^NGINX_CONF=' $WORKING_DIR/.env 2>/dev/null | tail -n 1 | cut -d= -f2-)
+if [ -n "$NGINX_CONF_PATH" ]; then
+    python3 $WORKING_DIR/scripts/installation_scripts/generate_nginx_conf.py $site_id --output "$NGINX_CONF_PATH" || {
+        echo "Failed to regenerate the nginx profile, keeping the previous one"
+        NGINX_CONF_PATH=""
+    }
+fi
+
 echo "Starting Core services..."
 docker compose -f $WORKING_DIR/docker-compose.yml up -d
 
+# A running proxy keeps its configuration until it is reloaded
+if [ -n "$NGINX_CONF_PATH" ]; then
+    docker exec nginx-proxy nginx -s reload || echo "Failed to reload nginx-proxy"
+fi
+
 # Check if Supabase is configured and enabled in the site config
-SUPABASE_ENABLED=$(python3 -c "
-import yaml
-with open(f'site_configs/${site_id}.yaml', 'r') as f:
-    config = yaml.safe_load(f)
+SUPABASE_ENABLED=$(python3 -c "${LOAD_SITE_CONFIG}
 print('true' if config['deployment_config']['enabled_services'].get('supabase', False) else 'false')
 ")
 if [ "$SUPABASE_ENABLED" = "true" ]; then
@@ -68,6 +97,16 @@ if [ "$SUPABASE_ENABLED" = "true" ]; then
     sudo docker compose -f docker-compose-cpms.yml up -d
 fi
 
+# Start the gateway metrics exporter if it is enabled in the site config
+METRICS_EXPORTER_ENABLED=$(python3 -c "${LOAD_SITE_CONFIG}
+print('true' if config['deployment_config']['enabled_services'].get('metrics-exporter', False) else 'false')
+")
+if [ "$METRICS_EXPORTER_ENABLED" = "true" ]; then
+    echo "Starting metrics exporter..."
+    pkill -f alto_metrics_exporter.py
+    nohup python3 $WORKING_DIR/scripts/monitoring_scripts/alto_metrics_exporter.py > /tmp/alto_metrics_exporter.log 2>&1 &
+fi
+
 echo "Warming up the services..."
 sleep 10
 